@@ -1,18 +1,21 @@
 import os
+import sys
+import time
+import logging
+import resource
 from copy import deepcopy
 from urllib.parse import parse_qs
 from pathlib import Path
 
+IMPORT_START = time.perf_counter()
+
 from celery import Celery
-from matplotlib import colormaps
-import pyvista as pv
 from dash import html, dcc, no_update, ctx
-from dash import Dash, Patch, Input, Output, State
+from dash import Dash, Patch, Input, Output, State, ClientsideFunction
 from dash import CeleryManager
 from dash.exceptions import PreventUpdate
 import dash_daq as daq
 import dash_bootstrap_components as dbc
-from dash_vtk.utils import preset_as_options
 from dash_pane_split import DashPaneSplit
 from dash_breakpoints import WindowBreakpoints
 
@@ -25,6 +28,7 @@ from consts import (
     PLAY_BTN_ID,
     PLAY_INTERVAL_ID,
     TIME_SLIDER_ID,
+    TIME_LABEL_ID,
     RENDER_MODE_DROPDOWN_ID,
     COLOR_MAP_DROPDOWN_ID,
     COLOR_MAP_VIEW_ID,
@@ -44,26 +48,94 @@ from consts import (
     ACTION_STORE_ID,
     CHECKPOINT_STORE_ID,
     ENABLE_THRESHOLD_ID,
+    THRESHOLD_INVERT_CHECKBOX_ID,
+    RANGES_STORE_ID,
+    RANGES_INTERVAL_ID,
+    LOD_DROPDOWN_ID,
+    POINT_BUDGET_DROPDOWN_ID,
+    IMAGE_FORMAT_DROPDOWN_ID,
+    COLOR_LIMITS_DROPDOWN_ID,
+    PRERENDER_BTN_ID,
+    PRERENDER_PROGRESS_ID,
+    PLAYBACK_FRAMES_STORE_ID,
+    PLAYBACK_IMAGE_ID,
+)
+from common import must_safe_join, union_range
+from timeseries import TimeSeriesMesh, stats_percentiles
+from lod import (
+    lod_options,
+    default_lod_level,
+    point_budget_options,
+    FULL_LEVEL,
+    AUTO_POINTS,
+    FULL_POINTS,
 )
-from utils import must_safe_join, merge_vtk_datasets
-from vdisplay import ensure_vdisplay
-from timeseries import TimeSeriesMesh
-from representation import MeshRepresentation
+from encoding import AUTO_FORMAT, image_format_options
+from probe import probe_artifact, stored_range
+from frames import frame_cache, make_frame_key, register_frame_stats_route
+from frames import PRERENDER_MAX_BYTES, frame_url, register_frame_route
+from instrumentation import instrumented, register_instrumentation
+from instrumentation import start_metrics_server
 
-AVIALABLE_CMAPS_INTERACTIVE = [
-    i for i in preset_as_options if i["label"] not in ("KAAMS",)
-]
+WORK_ROLE = os.getenv("WORK_ROLE")
+# The web role only routes callbacks to the workers, so it never loads VTK
+if WORK_ROLE != "app":
+    from vdisplay import ensure_vdisplay
+    from utils import split_component
+    from loader import load_grid, load_array_stats, grid_key
+    from prefetch import prefetcher
+    from decimate import lod_grid, point_cloud_grid
+    from cmaps import interactive_colormap_options, static_colormap_options
+    from representation import MeshRepresentation
+    from plotter_pool import plotter_pool
+    from sidecar import has_sidecar, ingest
 
-AVIALABLE_CMAPS_STATIC = []
-for cmap in colormaps:
-    try:
-        pv.LookupTable(cmap=cmap)
-        AVIALABLE_CMAPS_STATIC.append({"label": cmap, "value": cmap})
-    except Exception:
-        pass
+STARTUP_REPORT_MODULES = (
+    "vtkmodules",
+    "pyvista",
+    "dash_vtk.utils",
+    "matplotlib",
+    "numpy",
+    "PIL",
+    "celery",
+)
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+logger = logging.getLogger(__name__)
 
 
 ROOT_PATH = Path(os.getenv("VAR_ROOT", Path(__file__).parent / "examples"))
+PRERENDER_PROGRESS_STYLE = {"width": "8rem", "height": "1.25rem", "display": "flex"}
+COLOR_DATA_RANGE_OPTION = "color-data-range"
+FULL_LIMITS = "full"
+PERCENTILE_LIMITS = "percentile"
+COLOR_LIMITS_OPTIONS = [
+    {"label": "Min / Max", "value": FULL_LIMITS},
+    {"label": "1st / 99th Percentile", "value": PERCENTILE_LIMITS},
+]
+MESH_FINGERPRINT_OPTION = "mesh-fingerprint"
+# options that only change how the current mesh is drawn
+PRESENTATION_IDS = {
+    str(i)
+    for i in (
+        OPACITY_SLIDER_ID,
+        POINT_SIZE_SLIDER_ID,
+        LINE_WIDTH_SLIDER_ID,
+        COLOR_MAP_DROPDOWN_ID,
+        BACKGROUND_COLOR_PICKER_ID,
+        SHOW_SCALAR_BAR_ID,
+        IMAGE_FORMAT_DROPDOWN_ID,
+        ROTATE_X_SLIDER_ID,
+        ROTATE_Y_SLIDER_ID,
+    )
+}
+RANGE_SCAN_LOCK_TIMEOUT = int(os.getenv("RANGE_SCAN_LOCK_TIMEOUT", 60 * 30))
+# convert opened artifacts to memory-mapped sidecars in the background
+SIDECAR_INGEST = os.getenv("SIDECAR_INGEST", "false") == "true"
+INGEST_LOCK_TIMEOUT = int(os.getenv("INGEST_LOCK_TIMEOUT", 60 * 60))
+# labels on the time slider; other times are looked up as the slider moves
+TIME_SLIDER_MAX_TARGETS = int(os.getenv("TIME_SLIDER_MAX_TARGETS", 20))
+TIME_SLIDER_TARGET_WIDTH = 35  # px
 
 
 def get_option(options, name):
@@ -81,6 +153,12 @@ def exists_option(options, name):
 celery_app = Celery(
     __name__, broker=os.environ["REDIS_URL"], backend=os.environ["REDIS_URL"]
 )
+# mesh states and frames are large; compress them on the way through Redis
+celery_app.conf.result_compression = "zlib"
+celery_app.conf.task_routes = {
+    "mesh_viewer.compute_series_ranges": {"queue": "ranges"},
+    "mesh_viewer.ingest_artifact": {"queue": "ranges"},
+}
 background_callback_manager = CeleryManager(celery_app)
 app = Dash(
     __name__,
@@ -95,8 +173,132 @@ app = Dash(
     ],
 )
 server = app.server
-if os.getenv("WORK_ROLE") == "worker" and os.getenv("NO_STATIC_RENDERING") != "true":
+register_frame_stats_route(server)
+register_frame_route(server)
+register_instrumentation(server)
+if WORK_ROLE == "worker" and os.getenv("NO_STATIC_RENDERING") != "true":
     ensure_vdisplay(force=True)
+if WORK_ROLE == "worker":
+    start_metrics_server()
+
+
+def range_scan_lock_key(artifact):
+    return f"mesh-viewer:ranges:{artifact}"
+
+
+@celery_app.task(name="mesh_viewer.compute_series_ranges")
+def compute_series_ranges(artifact):
+    try:
+        filepath = must_safe_join(ROOT_PATH, artifact)
+        time_series = TimeSeriesMesh(filepath)
+        for _ in time_series.update_ranges():
+            pass
+    finally:
+        celery_app.backend.client.delete(range_scan_lock_key(artifact))
+
+
+def ingest_lock_key(artifact):
+    return f"mesh-viewer:ingest:{artifact}"
+
+
+@celery_app.task(name="mesh_viewer.ingest_artifact")
+def ingest_artifact(artifact):
+    try:
+        ingest(must_safe_join(ROOT_PATH, artifact))
+    finally:
+        celery_app.backend.client.delete(ingest_lock_key(artifact))
+
+
+def render_levels(render_mode, representation_type, lod_level, point_budget):
+    # level-of-detail surfaces only apply to interactive surfaces and point
+    # budgets to interactive point clouds; everything else draws the full grid
+    interactive = render_mode == RenderMode.Interactive.value
+    points = representation_type == RepresentationType.Points.value
+    if not interactive or points:
+        lod_level = FULL_LEVEL
+    if not (interactive and points):
+        point_budget = FULL_POINTS
+    return lod_level, point_budget
+
+
+def render_cache_key(filepath, slice, color_array_name, lod_level, point_budget):
+    # shared by every callback, so their threshold, surface and fingerprint
+    # cache entries are reused by the others
+    return (
+        grid_key(filepath, slice=slice, scalars=color_array_name),
+        lod_level,
+        point_budget,
+    )
+
+
+def series_range_key(series_ranges, slice, color_array_name):
+    # while the scan runs the colour range also depends on the store contents
+    if slice is None or not color_array_name:
+        return None
+    return (
+        series_ranges.get("ranges", {}).get(color_array_name),
+        series_ranges.get("percentiles", {}).get(color_array_name),
+        bool(series_ranges.get("complete")),
+    )
+
+
+def series_stats(stats, complete):
+    # the histograms stay on the server; the browser only needs percentiles
+    return {
+        "ranges": stats["ranges"],
+        "percentiles": stats_percentiles(stats),
+        "complete": complete,
+    }
+
+
+def color_array_stats(
+    filepath, series_ranges, slice, color_array_name, grid=None, cached_only=False
+):
+    # (range, percentiles) of the array over the whole series or file
+    if not color_array_name:
+        return None, None
+    if slice is not None:
+        return (
+            series_ranges.get("ranges", {}).get(color_array_name),
+            series_ranges.get("percentiles", {}).get(color_array_name),
+        )
+    stats = load_array_stats(
+        filepath, color_array_name, grid=grid, cached_only=cached_only
+    )
+    if stats is None:
+        return None, None
+    percentiles = stats_percentiles(stats)
+    return stats["ranges"].get(color_array_name), percentiles.get(color_array_name)
+
+
+def limit_range(color_data_range, percentiles, color_limits):
+    if color_limits == PERCENTILE_LIMITS and color_data_range and percentiles:
+        return percentiles
+    return color_data_range
+
+
+def percentile_marks(percentiles):
+    if not percentiles:
+        return {}
+    return {percentiles[0]: "1%", percentiles[1]: "99%"}
+
+
+def slice_time_label(time_series, slice):
+    return f"t = {time_series.slice_time(slice)}"
+
+
+def schedule_range_scan(artifact):
+    if celery_app.backend.client.set(
+        range_scan_lock_key(artifact), 1, nx=True, ex=RANGE_SCAN_LOCK_TIMEOUT
+    ):
+        compute_series_ranges.delay(artifact)
+
+
+def schedule_ingest(artifact):
+    if celery_app.backend.client.set(
+        ingest_lock_key(artifact), 1, nx=True, ex=INGEST_LOCK_TIMEOUT
+    ):
+        ingest_artifact.delay(artifact)
 
 
 @app.callback(
@@ -124,6 +326,8 @@ def save_viewport(width: str, height: str):
         THRESHOLD_RANGE_SLIDER_LOWER_ID.get_output("max"),
         THRESHOLD_RANGE_SLIDER_LOWER_ID.get_output("step"),
         THRESHOLD_RANGE_SLIDER_LOWER_ID.get_output("value"),
+        THRESHOLD_RANGE_SLIDER_LOWER_ID.get_output("marks"),
+        PLAYBACK_FRAMES_STORE_ID.get_output("data"),
     ],
     [
         RENDER_MODE_DROPDOWN_ID.get_input("value"),
@@ -139,6 +343,12 @@ def save_viewport(width: str, height: str):
         ROTATE_X_SLIDER_ID.get_input("value"),
         ROTATE_Y_SLIDER_ID.get_input("value"),
         THRESHOLD_RANGE_SLIDER_LOWER_ID.get_input("value"),
+        RANGES_STORE_ID.get_input("data"),
+        LOD_DROPDOWN_ID.get_input("value"),
+        IMAGE_FORMAT_DROPDOWN_ID.get_input("value"),
+        THRESHOLD_INVERT_CHECKBOX_ID.get_input("on"),
+        COLOR_LIMITS_DROPDOWN_ID.get_input("value"),
+        POINT_BUDGET_DROPDOWN_ID.get_input("value"),
         State("viewport", "data"),
         OPTIONS_STORE_ID.get_state("data"),
         PLAY_INTERVAL_ID.get_state("disabled"),
@@ -154,6 +364,7 @@ def save_viewport(width: str, height: str):
     background=True,
     prevent_initial_call=True,
 )
+@instrumented("rerender")
 def rerender(
     render_mode,
     color_array_name,
@@ -168,6 +379,12 @@ def rerender(
     rotate_x,
     rotate_y,
     threshold,
+    series_ranges,
+    lod_level,
+    image_format,
+    invert_threshold,
+    color_limits,
+    point_budget,
     viewport,
     saved_options,
     interval_disabled,
@@ -186,9 +403,9 @@ def rerender(
 
     if ctx.triggered_id == RENDER_MODE_DROPDOWN_ID.get_identifier():
         colormaps = (
-            AVIALABLE_CMAPS_STATIC
+            static_colormap_options()
             if render_mode == RenderMode.Static.value
-            else AVIALABLE_CMAPS_INTERACTIVE
+            else interactive_colormap_options()
         )
         color_map = "coolwarm"
         set_option(options, COLOR_MAP_DROPDOWN_ID, color_map)
@@ -203,38 +420,54 @@ def rerender(
     filepath = must_safe_join(ROOT_PATH, artifact)
     if not filepath.exists():
         raise PreventUpdate("File does not exist")
-    color_data_range = None
-    if artifact.endswith(".series"):
-        time_series = TimeSeriesMesh(filepath)
-        if n_steps >= time_series.n_slices:
-            raise PreventUpdate("No more slices")
-        blocks = time_series.read_blocks(n_steps)
-        _, grid, _ = merge_vtk_datasets(blocks, scalars=color_array_name)
-        if color_array_name:
-            ranges = time_series.get_ranges()
-            color_data_range = ranges.get(color_array_name)
-    else:
-        blocks = pv.read(filepath)
-        _, grid, _ = merge_vtk_datasets(blocks, scalars=color_array_name)
-        if color_array_name:
-            color_data_range = grid.get_data_range(color_array_name)
 
+    triggered_ids = {i["prop_id"].rsplit(".", 1)[0] for i in ctx.triggered}
     if (
-        ctx.triggered_id == COLOR_ARRAY_NAME_DROPDOWN_ID.get_identifier()
-        and color_data_range
+        render_mode == RenderMode.Interactive.value
+        and triggered_ids
+        and triggered_ids <= PRESENTATION_IDS
     ):
-        threshold_min = color_data_range[0]
-        threshold_max = color_data_range[1]
-        threshold_step = (threshold_max - threshold_min) / 100
-        threshold_value = [threshold_min, threshold_max]
-    else:
-        threshold_min = no_update
-        threshold_max = no_update
-        threshold_step = no_update
-        threshold_value = no_update
+        representation = MeshRepresentation(
+            None,
+            color_array_name=color_array_name,
+            color_map=color_map,
+            opacity=opacity,
+            point_size=point_size,
+            rotate_x=rotate_x,
+            rotate_y=rotate_y,
+            background_color=background_color["hex"],
+            line_width=line_size,
+            show_scalar_bar=show_scalar_bar,
+            representation_type=representation_type,
+        )
+        return (
+            None,
+            options,
+            representation.get_patch(
+                get_option(saved_options, COLOR_DATA_RANGE_OPTION)
+            ),
+            colormaps,
+            color_map,
+            interval,
+            interval_disabled,
+            no_update,
+            no_update,
+            no_update,
+            no_update,
+            no_update,
+            None,
+        )
+
+    slice = n_steps if artifact.endswith(".series") else None
+    if slice is not None and slice >= TimeSeriesMesh(filepath).n_slices:
+        raise PreventUpdate("No more slices")
+    lod_level, point_budget = render_levels(
+        render_mode, representation_type, lod_level, point_budget
+    )
+    series_ranges = series_ranges or {}
 
     representation = MeshRepresentation(
-        grid,
+        None,
         color_array_name=color_array_name,
         render_mode=render_mode,
         color_map=color_map,
@@ -243,16 +476,126 @@ def rerender(
         rotate_y=rotate_y,
         point_size=point_size,
         enable_threshold=enable_threshold,
+        invert_threshold=invert_threshold,
         threshold=threshold,
         background_color=background_color["hex"],
         line_width=line_size,
         show_scalar_bar=show_scalar_bar,
         representation_type=representation_type,
+        cache_key=render_cache_key(
+            filepath, slice, color_array_name, lod_level, point_budget
+        ),
+        track_topology=slice is not None,
+        image_format=image_format,
+        playing=not interval_disabled,
+    )
+    frame_key = None
+    frame = None
+    if representation.cacheable:
+        frame_key = make_frame_key(
+            representation.render_key(viewport),
+            series_range_key(series_ranges, slice, color_array_name),
+            color_limits,
+        )
+        frame = frame_cache.get(frame_key)
+
+    array_changed = ctx.triggered_id == COLOR_ARRAY_NAME_DROPDOWN_ID.get_identifier()
+    grid = None
+    if frame is not None:
+        color_data_range = frame.color_data_range
+    elif slice is not None:
+        if not interval_disabled:
+            # playing: keep the next slices in the playback direction warm
+            previous_step = get_option(saved_options, TIME_SLIDER_ID) or 0
+            prefetcher.schedule(
+                filepath,
+                n_steps,
+                direction=n_steps - previous_step,
+                scalars=color_array_name,
+            )
+            _, grid, _ = prefetcher.load(filepath, n_steps, scalars=color_array_name)
+        else:
+            prefetcher.cancel()
+            _, grid, _ = load_grid(filepath, slice=n_steps, scalars=color_array_name)
+        color_data_range = None
+        if color_array_name:
+            color_data_range = series_ranges.get("ranges", {}).get(color_array_name)
+            if not series_ranges.get("complete"):
+                # the global range is still being scanned in the background
+                color_data_range = union_range(
+                    color_data_range, grid.get_data_range(color_array_name)
+                )
+    else:
+        _, grid, _ = load_grid(filepath, scalars=color_array_name)
+        color_data_range = None
+        if color_array_name:
+            color_data_range = grid.get_data_range(color_array_name)
+
+    data_range = None
+    percentiles = None
+    if color_limits == PERCENTILE_LIMITS or array_changed:
+        data_range, percentiles = color_array_stats(
+            filepath, series_ranges, slice, color_array_name, grid=grid
+        )
+    if frame is None:
+        # a cached frame already carries the limits it was drawn with
+        data_range = color_data_range
+        color_data_range = limit_range(color_data_range, percentiles, color_limits)
+
+    if array_changed and data_range:
+        # the threshold spans the whole array; percentiles are marked on it
+        threshold_min = data_range[0]
+        threshold_max = data_range[1]
+        threshold_step = (threshold_max - threshold_min) / 100
+        threshold_value = [threshold_min, threshold_max]
+        threshold_marks = percentile_marks(percentiles)
+    else:
+        threshold_min = no_update
+        threshold_max = no_update
+        threshold_step = no_update
+        threshold_value = no_update
+        threshold_marks = no_update
+    set_option(options, COLOR_DATA_RANGE_OPTION, color_data_range)
+
+    view = None
+    if frame is not None:
+        view = representation.view_from_frame(frame, frame_key)
+    else:
+        reduced = point_cloud_grid(
+            grid, filepath, point_budget, slice=slice, scalars=color_array_name
+        )
+        if reduced is grid:
+            # small enough to keep every point, or not drawn as points
+            reduced = lod_grid(
+                grid, filepath, lod_level, slice=slice, scalars=color_array_name
+            )
+        representation.grid = reduced
+        if (
+            slice is not None
+            and render_mode == RenderMode.Interactive.value
+            and triggered_ids == {str(TIME_SLIDER_ID)}
+        ):
+            # constant topology: only the new field values go to the client
+            view = representation.get_field_patch(
+                color_data_range, get_option(saved_options, MESH_FINGERPRINT_OPTION)
+            )
+    if view is None:
+        view = representation.get_view(
+            color_data_range=color_data_range, viewport=viewport, frame_key=frame_key
+        )
+        if frame_key is not None and representation.frame is not None:
+            frame_cache.put(frame_key, representation.frame)
+    set_option(options, MESH_FINGERPRINT_OPTION, representation.fingerprint)
+    # pre-rendered frames are only valid for the options they were made with
+    playback_frames = (
+        no_update
+        if triggered_ids <= {str(TIME_SLIDER_ID), str(RANGES_STORE_ID)}
+        else None
     )
     return (
         None,
         options,
-        representation.get_view(color_data_range=color_data_range, viewport=viewport),
+        view,
         colormaps,
         color_map,
         interval,
@@ -261,6 +604,8 @@ def rerender(
         threshold_max,
         threshold_step,
         threshold_value,
+        threshold_marks,
+        playback_frames,
     )
 
 
@@ -350,6 +695,24 @@ def play_time_series(n_clicks, n_steps, interval_disabled, saved_options):
         )
 
 
+@app.callback(
+    TIME_LABEL_ID.get_output("children"),
+    TIME_SLIDER_ID.get_input("value"),
+    OPTIONS_STORE_ID.get_state("data"),
+    prevent_initial_call=True,
+)
+def show_slice_time(slice, saved_options):
+    # only a sample of the times is sent with the slider
+    artifact = get_option(saved_options or {}, ARTIFACT_STORE_ID)
+    if slice is None or not artifact or not artifact.endswith(".series"):
+        raise PreventUpdate("Not a time series")
+    time_series = TimeSeriesMesh(must_safe_join(ROOT_PATH, artifact))
+    try:
+        return slice_time_label(time_series, slice)
+    except (OSError, ValueError, IndexError):
+        raise PreventUpdate("Slice does not exist")
+
+
 @app.callback(
     [
         OPTIONS_STORE_ID.get_output("data"),
@@ -359,24 +722,191 @@ def play_time_series(n_clicks, n_steps, interval_disabled, saved_options):
     [
         PLAY_INTERVAL_ID.get_input("n_intervals"),
         TIME_SLIDER_ID.get_input("value"),
+        PLAY_INTERVAL_ID.get_input("disabled"),
+        PLAYBACK_FRAMES_STORE_ID.get_state("data"),
     ],
     prevent_initial_call=True,
 )
-def tick_time_series(n_intervals, n_steps):
+def tick_time_series(n_intervals, n_steps, interval_disabled, playback_frames):
     options = Patch()
 
     set_option(options, TIME_SLIDER_ID, n_steps)
     set_option(options, PLAY_INTERVAL_ID, n_intervals)
 
     if ctx.triggered_id == PLAY_INTERVAL_ID.get_identifier():
+        if playback_frames:
+            # pre-rendered frames play in the browser; the slider, and with it
+            # a server render, only catches up once playback stops
+            if not interval_disabled:
+                return options, no_update, no_update
+            return options, n_intervals, no_update
+        triggered_props = {i["prop_id"].rsplit(".", 1)[1] for i in ctx.triggered}
+        if triggered_props == {"disabled"}:
+            raise PreventUpdate("Playback state only")
         return options, n_intervals, no_update
     else:
         return options, no_update, n_steps
 
 
+app.clientside_callback(
+    ClientsideFunction(namespace="playback", function_name="showFrame"),
+    [
+        PLAYBACK_IMAGE_ID.get_output("src"),
+        PLAYBACK_IMAGE_ID.get_output("style"),
+    ],
+    [
+        PLAY_INTERVAL_ID.get_input("n_intervals"),
+        PLAY_INTERVAL_ID.get_input("disabled"),
+        PLAYBACK_FRAMES_STORE_ID.get_input("data"),
+    ],
+    prevent_initial_call=True,
+)
+
+
+@app.callback(
+    PLAYBACK_FRAMES_STORE_ID.get_output("data"),
+    PRERENDER_BTN_ID.get_input("n_clicks"),
+    [
+        State("viewport", "data"),
+        OPTIONS_STORE_ID.get_state("data"),
+        ENABLE_THRESHOLD_ID.get_state("on"),
+    ],
+    running=[
+        (PRERENDER_BTN_ID.get_output("disabled"), True, False),
+        (
+            PRERENDER_PROGRESS_ID.get_output("style"),
+            PRERENDER_PROGRESS_STYLE,
+            {"display": "none"},
+        ),
+    ],
+    progress=[
+        PRERENDER_PROGRESS_ID.get_output("value"),
+        PRERENDER_PROGRESS_ID.get_output("label"),
+    ],
+    background=True,
+    prevent_initial_call=True,
+)
+@instrumented("prerender")
+def prerender_series(set_progress, n_clicks, viewport, saved_options, enable_threshold):
+    if not n_clicks:
+        raise PreventUpdate("No click")
+
+    artifact = get_option(saved_options, ARTIFACT_STORE_ID)
+    if not artifact or not artifact.endswith(".series"):
+        raise PreventUpdate("Not a time series")
+
+    filepath = must_safe_join(ROOT_PATH, artifact)
+    if not filepath.exists():
+        raise PreventUpdate("File does not exist")
+
+    time_series = TimeSeriesMesh(filepath)
+    n_slices = time_series.n_slices
+    color_array_name = get_option(saved_options, COLOR_ARRAY_NAME_DROPDOWN_ID)
+    background_color = get_option(saved_options, BACKGROUND_COLOR_PICKER_ID)["hex"]
+    # every frame shares one colour scale, so the range scan has to finish
+    # first; it runs on the range workers, not on this render slot
+    stats, complete = time_series.cached_stats()
+    if not complete:
+        schedule_range_scan(artifact)
+        raise PreventUpdate("Series ranges are still being scanned")
+    series_ranges = series_stats(stats, complete)
+    color_limits = get_option(saved_options, COLOR_LIMITS_DROPDOWN_ID)
+    color_data_range, percentiles = color_array_stats(
+        filepath, series_ranges, 0, color_array_name
+    )
+    color_data_range = limit_range(color_data_range, percentiles, color_limits)
+
+    # frames are served from the frame cache by key, so playback never
+    # depends on a copy that may have been evicted
+    frames = [None] * n_slices
+    frame_bytes = 0
+    pending = []
+    for slice in range(n_slices):
+        representation = MeshRepresentation(
+            None,
+            color_array_name=color_array_name,
+            render_mode=RenderMode.Static.value,
+            color_map=get_option(saved_options, COLOR_MAP_DROPDOWN_ID),
+            opacity=get_option(saved_options, OPACITY_SLIDER_ID),
+            rotate_x=get_option(saved_options, ROTATE_X_SLIDER_ID),
+            rotate_y=get_option(saved_options, ROTATE_Y_SLIDER_ID),
+            point_size=get_option(saved_options, POINT_SIZE_SLIDER_ID),
+            enable_threshold=enable_threshold,
+            invert_threshold=get_option(saved_options, THRESHOLD_INVERT_CHECKBOX_ID),
+            threshold=get_option(saved_options, THRESHOLD_RANGE_SLIDER_LOWER_ID),
+            background_color=background_color,
+            line_width=get_option(saved_options, LINE_WIDTH_SLIDER_ID),
+            show_scalar_bar=get_option(saved_options, SHOW_SCALAR_BAR_ID),
+            representation_type=get_option(
+                saved_options, REPRESENTATION_TYPE_DROPDOWN_ID
+            ),
+            cache_key=render_cache_key(
+                filepath, slice, color_array_name, FULL_LEVEL, FULL_POINTS
+            ),
+            track_topology=True,
+            image_format=get_option(saved_options, IMAGE_FORMAT_DROPDOWN_ID),
+            playing=True,
+        )
+        frame_key = make_frame_key(
+            representation.render_key(viewport),
+            series_range_key(series_ranges, slice, color_array_name),
+            color_limits,
+        )
+        frame = frame_cache.get(frame_key)
+        if frame is not None:
+            frames[slice] = frame_url(frame_key, frame)
+            frame_bytes += len(frame.data)
+        else:
+            pending.append((slice, representation, frame_key))
+
+    done = n_slices - len(pending)
+    set_progress((done * 100 // n_slices, f"{done}/{n_slices}"))
+
+    def grids():
+        for slice, representation, _ in pending:
+            if frame_bytes > PRERENDER_MAX_BYTES:
+                return
+            _, grid, _ = load_grid(filepath, slice=slice, scalars=color_array_name)
+            representation.grid = grid
+            yield representation.prepare_grid()
+
+    def on_frame(index, image):
+        nonlocal frame_bytes
+        slice, representation, frame_key = pending[index]
+        encoded = representation.encode_frame(image, color_data_range)
+        frame_cache.put(frame_key, representation.frame)
+        frames[slice] = frame_url(frame_key, encoded)
+        frame_bytes += len(encoded.data)
+        done = n_slices - len(pending) + index + 1
+        set_progress((done * 100 // n_slices, f"{done}/{n_slices}"))
+
+    if pending:
+        representation = pending[0][1]
+        plotter_pool.render_sequence(
+            grids(),
+            on_frame,
+            mesh_kwargs=representation.mesh_kwargs(color_data_range),
+            properties=representation.actor_properties(),
+            orientation=representation.orientation(),
+            background_color=background_color,
+            window_size=representation.window_size(viewport),
+        )
+    if frame_bytes > PRERENDER_MAX_BYTES:
+        # playback falls back to server renders, which reuse the cached frames
+        logger.warning(
+            "%s: pre-rendered frames exceed %d bytes", artifact, PRERENDER_MAX_BYTES
+        )
+        return None
+    return {"artifact": artifact, "frames": frames}
+
+
 DEFAULT_OPTIONS = {
     str(PLAY_INTERVAL_ID): 0,
     str(RENDER_MODE_DROPDOWN_ID): RenderMode.Interactive.value,
+    str(LOD_DROPDOWN_ID): FULL_LEVEL,
+    str(POINT_BUDGET_DROPDOWN_ID): AUTO_POINTS,
+    str(IMAGE_FORMAT_DROPDOWN_ID): AUTO_FORMAT,
+    str(COLOR_LIMITS_DROPDOWN_ID): FULL_LIMITS,
     str(COLOR_MAP_DROPDOWN_ID): "coolwarm",
     str(COLOR_ARRAY_NAME_DROPDOWN_ID): None,
     str(REPRESENTATION_TYPE_DROPDOWN_ID): RepresentationType.Surface.value,
@@ -390,6 +920,7 @@ DEFAULT_OPTIONS = {
     str(ROTATE_Y_SLIDER_ID): 0,
     str(TIME_SLIDER_ID): 0,
     str(ENABLE_THRESHOLD_ID): False,
+    str(THRESHOLD_INVERT_CHECKBOX_ID): False,
 }
 app.layout = html.Div(
     [
@@ -399,6 +930,8 @@ app.layout = html.Div(
         dcc.Store(id="viewport", storage_type="memory"),
         dcc.Store(id=ACTION_STORE_ID.get_identifier(), storage_type="memory"),
         dcc.Store(id=CHECKPOINT_STORE_ID.get_identifier(), storage_type="memory"),
+        dcc.Store(id=RANGES_STORE_ID.get_identifier(), storage_type="memory"),
+        dcc.Store(id=PLAYBACK_FRAMES_STORE_ID.get_identifier(), storage_type="memory"),
         dcc.Location(id=URL_LOCATION_ID.get_identifier(), refresh=False),
         dcc.Store(
             id=OPTIONS_STORE_ID.get_identifier(),
@@ -412,6 +945,11 @@ app.layout = html.Div(
             max_intervals=0,
             disabled=True,
         ),
+        dcc.Interval(
+            id=RANGES_INTERVAL_ID.get_identifier(),
+            interval=2000,
+            disabled=True,
+        ),
         DashPaneSplit(
             id="split",
             mainStyle={"width": "100%", "height": "100%"},
@@ -444,8 +982,18 @@ app.layout = html.Div(
                             "padding": 0,
                         },
                     ),
+                    html.Img(
+                        id=PLAYBACK_IMAGE_ID.get_identifier(),
+                        style={"display": "none"},
+                    ),
                 ],
-                style={"height": "100%", "width": "100%", "margin": 0, "padding": 0},
+                style={
+                    "height": "100%",
+                    "width": "100%",
+                    "margin": 0,
+                    "padding": 0,
+                    "position": "relative",
+                },
             ),
             sidebarTitle="Options",
             sidebarChildren=html.Div(
@@ -467,6 +1015,51 @@ app.layout = html.Div(
                             "flexDirection": "column",
                         },
                     ),
+                    html.Div(
+                        [
+                            html.Caption("Level of Detail"),
+                            dcc.Dropdown(
+                                id=LOD_DROPDOWN_ID.get_identifier(),
+                                options=lod_options(),
+                                value=DEFAULT_OPTIONS[str(LOD_DROPDOWN_ID)],
+                                clearable=False,
+                            ),
+                        ],
+                        style={
+                            "display": "flex",
+                            "flexDirection": "column",
+                        },
+                    ),
+                    html.Div(
+                        [
+                            html.Caption("Point Budget"),
+                            dcc.Dropdown(
+                                id=POINT_BUDGET_DROPDOWN_ID.get_identifier(),
+                                options=point_budget_options(),
+                                value=DEFAULT_OPTIONS[str(POINT_BUDGET_DROPDOWN_ID)],
+                                clearable=False,
+                            ),
+                        ],
+                        style={
+                            "display": "flex",
+                            "flexDirection": "column",
+                        },
+                    ),
+                    html.Div(
+                        [
+                            html.Caption("Image Format"),
+                            dcc.Dropdown(
+                                id=IMAGE_FORMAT_DROPDOWN_ID.get_identifier(),
+                                options=image_format_options(),
+                                value=DEFAULT_OPTIONS[str(IMAGE_FORMAT_DROPDOWN_ID)],
+                                clearable=False,
+                            ),
+                        ],
+                        style={
+                            "display": "flex",
+                            "flexDirection": "column",
+                        },
+                    ),
                     html.Div(
                         [
                             html.Caption("Color Map"),
@@ -498,6 +1091,21 @@ app.layout = html.Div(
                             "flexDirection": "column",
                         },
                     ),
+                    html.Div(
+                        [
+                            html.Caption("Color Limits"),
+                            dcc.Dropdown(
+                                id=COLOR_LIMITS_DROPDOWN_ID.get_identifier(),
+                                options=COLOR_LIMITS_OPTIONS,
+                                value=DEFAULT_OPTIONS[str(COLOR_LIMITS_DROPDOWN_ID)],
+                                clearable=False,
+                            ),
+                        ],
+                        style={
+                            "display": "flex",
+                            "flexDirection": "column",
+                        },
+                    ),
                     html.Div(
                         [
                             html.Caption("Representation Type"),
@@ -633,6 +1241,19 @@ app.layout = html.Div(
                             "flexDirection": "column",
                         },
                     ),
+                    html.Div(
+                        [
+                            html.Caption("Invert Threshold"),
+                            daq.BooleanSwitch(
+                                id=THRESHOLD_INVERT_CHECKBOX_ID.get_identifier(),
+                                on=DEFAULT_OPTIONS[str(THRESHOLD_INVERT_CHECKBOX_ID)],
+                            ),
+                        ],
+                        style={
+                            "display": "flex",
+                            "flexDirection": "column",
+                        },
+                    ),
                     html.Div(
                         [
                             html.Caption("Threshold Range"),
@@ -694,6 +1315,7 @@ app.layout = html.Div(
         COLOR_ARRAY_NAME_DROPDOWN_ID.get_output("value"),
         RENDER_MODE_DROPDOWN_ID.get_output("value"),
         RENDER_MODE_DROPDOWN_ID.get_output("disabled"),
+        LOD_DROPDOWN_ID.get_output("value"),
         COLOR_MAP_DROPDOWN_ID.get_output("options"),
         PLAY_INTERVAL_ID.get_output("interval"),
         COLOR_MAP_VIEW_ID.get_output("style"),
@@ -701,6 +1323,10 @@ app.layout = html.Div(
         THRESHOLD_RANGE_SLIDER_LOWER_ID.get_output("max"),
         THRESHOLD_RANGE_SLIDER_LOWER_ID.get_output("step"),
         THRESHOLD_RANGE_SLIDER_LOWER_ID.get_output("value"),
+        THRESHOLD_RANGE_SLIDER_LOWER_ID.get_output("marks"),
+        RANGES_STORE_ID.get_output("data"),
+        RANGES_INTERVAL_ID.get_output("disabled"),
+        PLAYBACK_FRAMES_STORE_ID.get_output("data"),
     ],
     [
         URL_LOCATION_ID.get_input("search"),
@@ -709,6 +1335,7 @@ app.layout = html.Div(
     background=True,
     prevent_initial_call=True,
 )
+@instrumented("viewer")
 def viewer(search, viewport):
     qs = parse_qs(search.lstrip("?")) if search else {}
     artifacts = qs.get("artifact")
@@ -721,31 +1348,40 @@ def viewer(search, viewport):
         raise PreventUpdate("File does not exist")
 
     options = deepcopy(DEFAULT_OPTIONS)
+    prefetcher.cancel()
 
     set_option(options, ARTIFACT_STORE_ID, artifact)
     set_option(options, TIME_SLIDER_ID, 0)
 
-    color_data_range = None
     color_array_name = None
     array_names = []
-    if artifact.endswith(".series"):
-        time_series = TimeSeriesMesh(filepath)
-        blocks = time_series.read_blocks(0)
-        array_names, grid, has_missing = merge_vtk_datasets(blocks)
-        if array_names:
-            color_array_name = array_names[0]
-            if has_missing:
-                _, grid, _ = merge_vtk_datasets(blocks, scalars=color_array_name)
-            ranges = time_series.get_ranges()
-            color_data_range = ranges.get(color_array_name)
+    slice = 0 if artifact.endswith(".series") else None
+    summary = probe_artifact(filepath)
+    if summary is not None:
+        array_names = summary["array_names"]
+        color_array_name = array_names[0] if array_names else None
+        # loaded only when the frame cache cannot answer
+        grid = None
+        memory_size = summary["memory_size"]
     else:
-        blocks = pv.read(filepath)
-        array_names, grid, has_missing = merge_vtk_datasets(blocks)
+        array_names, grid, has_missing = load_grid(filepath, slice=slice)
         if array_names:
             color_array_name = array_names[0]
             if has_missing:
-                _, grid, _ = merge_vtk_datasets(blocks, scalars=color_array_name)
-            color_data_range = grid.get_data_range(color_array_name)
+                _, grid, _ = load_grid(filepath, slice=slice, scalars=color_array_name)
+            else:
+                split_component(grid, color_array_name)
+        memory_size = grid.actual_memory_size
+    if SIDECAR_INGEST and not has_sidecar(filepath, slice=slice):
+        schedule_ingest(artifact)
+    series_ranges = None
+    if artifact.endswith(".series"):
+        time_series = TimeSeriesMesh(filepath)
+        stats, complete = time_series.cached_stats(verify_slices=True)
+        if not complete:
+            schedule_range_scan(artifact)
+        series_ranges = series_stats(stats, complete)
+        set_option(options, RANGES_STORE_ID, series_ranges)
     colormap_view_style = Patch()
     if not array_names:
         colormap_view_style["display"] = "none"
@@ -753,41 +1389,89 @@ def viewer(search, viewport):
         colormap_view_style["display"] = "flex"
     set_option(options, COLOR_ARRAY_NAME_DROPDOWN_ID, color_array_name)
 
-    if grid.actual_memory_size > 1024 * 50:  # 50MB
-        render_mode = RenderMode.Static.value
-    else:
-        render_mode = RenderMode.Interactive.value
+    # large datasets start interactive on the coarsest level of detail
+    render_mode = RenderMode.Interactive.value
+    lod_level = default_lod_level(memory_size)
+    set_option(options, LOD_DROPDOWN_ID, lod_level)
 
     interval = 1000 if render_mode == RenderMode.Interactive.value else 1000
     colormaps = (
-        AVIALABLE_CMAPS_STATIC
+        static_colormap_options()
         if render_mode == RenderMode.Static.value
-        else AVIALABLE_CMAPS_INTERACTIVE
+        else interactive_colormap_options()
     )
     set_option(options, RENDER_MODE_DROPDOWN_ID, render_mode)
 
     representation = MeshRepresentation(
-        grid,
+        None,
         render_mode=render_mode,
         color_array_name=color_array_name,
         background_color=options[str(BACKGROUND_COLOR_PICKER_ID)]["hex"],
+        cache_key=render_cache_key(
+            filepath, slice, color_array_name, lod_level, FULL_POINTS
+        ),
+        track_topology=slice is not None,
     )
+    frame_key = None
+    frame = None
+    if representation.cacheable:
+        frame_key = make_frame_key(
+            representation.render_key(viewport),
+            series_range_key(series_ranges or {}, slice, color_array_name),
+            get_option(options, COLOR_LIMITS_DROPDOWN_ID),
+        )
+        frame = frame_cache.get(frame_key)
+
+    if frame is not None:
+        color_data_range = frame.color_data_range
+    else:
+        if grid is None:
+            _, grid, _ = load_grid(filepath, slice=slice, scalars=color_array_name)
+        color_data_range = None
+        if slice is not None and color_array_name:
+            color_data_range = series_ranges["ranges"].get(color_array_name)
+            if not series_ranges["complete"]:
+                color_data_range = union_range(
+                    color_data_range, grid.get_data_range(color_array_name)
+                )
+        elif color_array_name:
+            color_data_range = stored_range(
+                summary, color_array_name
+            ) or grid.get_data_range(color_array_name)
+    set_option(options, COLOR_DATA_RANGE_OPTION, color_data_range)
+
     if color_data_range:
         threshold_min = color_data_range[0]
         threshold_max = color_data_range[1]
         threshold_step = (threshold_max - threshold_min) / 100
         threshold_value = [threshold_min, threshold_max]
         set_option(options, THRESHOLD_RANGE_SLIDER_LOWER_ID, threshold_value)
+        # single files are only scanned once the colour array is changed
+        _, percentiles = color_array_stats(
+            filepath, series_ranges, slice, color_array_name, cached_only=True
+        )
+        threshold_marks = percentile_marks(percentiles)
     else:
         threshold_min = no_update
         threshold_max = no_update
         threshold_step = no_update
         threshold_value = no_update
-    vtk_view = representation.get_view(
-        color_data_range=color_data_range, viewport=viewport
-    )
+        threshold_marks = no_update
+    if frame is not None:
+        vtk_view = representation.view_from_frame(frame, frame_key)
+    else:
+        representation.grid = lod_grid(
+            grid, filepath, lod_level, slice=slice, scalars=color_array_name
+        )
+        vtk_view = representation.get_view(
+            color_data_range=color_data_range, viewport=viewport, frame_key=frame_key
+        )
+        if frame_key is not None and representation.frame is not None:
+            frame_cache.put(frame_key, representation.frame)
+    set_option(options, MESH_FINGERPRINT_OPTION, representation.fingerprint)
     if artifact.endswith(".series"):
         vtk_view.style["height"] = "calc(100vh - 2rem)"
+        time_targets = time_series.time_targets(TIME_SLIDER_MAX_TARGETS)
         main_view = html.Div(
             [
                 dbc.Row(
@@ -812,16 +1496,38 @@ def viewer(search, viewport):
                                 "marginRight": "1rem",
                             },
                         ),
+                        html.Div(
+                            [
+                                dbc.Button(
+                                    html.I(
+                                        className="bi bi-film",
+                                        disable_n_clicks=True,
+                                        style={
+                                            "fontSize": "1.5rem",
+                                            "color": "black",
+                                        },
+                                    ),
+                                    id=PRERENDER_BTN_ID.get_identifier(),
+                                    className="d-flex align-items-center",
+                                    color="link",
+                                    title="Pre-render series",
+                                ),
+                                dbc.Progress(
+                                    id=PRERENDER_PROGRESS_ID.get_identifier(),
+                                    value=0,
+                                    style={"display": "none"},
+                                ),
+                            ],
+                            className="d-flex align-items-center",
+                            style={"marginRight": "1rem"},
+                        ),
                         html.Div(
                             daq.Slider(
                                 id=TIME_SLIDER_ID.get_identifier(),
                                 min=0,
                                 step=1,
-                                size=len(time_series.info["files"]) * 35,
-                                targets={
-                                    i: str(time_series.info["files"][i]["time"])
-                                    for i in range(time_series.n_slices)
-                                },
+                                size=len(time_targets) * TIME_SLIDER_TARGET_WIDTH,
+                                targets=time_targets,
                                 value=get_option(DEFAULT_OPTIONS, TIME_SLIDER_ID),
                                 max=time_series.n_slices - 1,
                             ),
@@ -830,6 +1536,11 @@ def viewer(search, viewport):
                                 "paddingTop": "1.5rem",
                             },
                         ),
+                        html.Span(
+                            slice_time_label(time_series, 0),
+                            id=TIME_LABEL_ID.get_identifier(),
+                            style={"marginLeft": "1.5rem", "whiteSpace": "nowrap"},
+                        ),
                     ],
                     style={
                         "height": "3.5rem",
@@ -875,6 +1586,7 @@ def viewer(search, viewport):
                             value=get_option(options, TIME_SLIDER_ID),
                             id=TIME_SLIDER_ID.get_identifier(),
                         ),
+                        html.Span(id=TIME_LABEL_ID.get_identifier()),
                     ],
                     style={"display": "none"},
                 ),
@@ -890,6 +1602,7 @@ def viewer(search, viewport):
         color_array_name,
         render_mode,
         False,
+        lod_level,
         colormaps,
         interval,
         colormap_view_style,
@@ -897,8 +1610,91 @@ def viewer(search, viewport):
         threshold_max,
         threshold_step,
         threshold_value,
+        threshold_marks,
+        series_ranges,
+        series_ranges is None or series_ranges["complete"],
+        None,
     )
 
 
+@app.callback(
+    [
+        RANGES_STORE_ID.get_output("data"),
+        RANGES_INTERVAL_ID.get_output("disabled"),
+        THRESHOLD_RANGE_SLIDER_LOWER_ID.get_output("min"),
+        THRESHOLD_RANGE_SLIDER_LOWER_ID.get_output("max"),
+        THRESHOLD_RANGE_SLIDER_LOWER_ID.get_output("step"),
+        THRESHOLD_RANGE_SLIDER_LOWER_ID.get_output("value"),
+        THRESHOLD_RANGE_SLIDER_LOWER_ID.get_output("marks"),
+    ],
+    [
+        RANGES_INTERVAL_ID.get_input("n_intervals"),
+        RANGES_STORE_ID.get_state("data"),
+        COLOR_ARRAY_NAME_DROPDOWN_ID.get_state("value"),
+        THRESHOLD_RANGE_SLIDER_LOWER_ID.get_state("value"),
+        OPTIONS_STORE_ID.get_state("data"),
+    ],
+    prevent_initial_call=True,
+)
+def refresh_ranges(n_intervals, series_ranges, color_array_name, threshold, options):
+    artifact = get_option(options, ARTIFACT_STORE_ID)
+    if not artifact or not artifact.endswith(".series"):
+        raise PreventUpdate("Not a time series")
+
+    filepath = must_safe_join(ROOT_PATH, artifact)
+    stats, complete = TimeSeriesMesh(filepath).cached_stats()
+    ranges = stats["ranges"]
+    series_ranges = series_ranges or {}
+    old_ranges = series_ranges.get("ranges") or {}
+    if ranges == old_ranges and complete == series_ranges.get("complete"):
+        raise PreventUpdate("No change")
+    new_ranges = series_stats(stats, complete)
+
+    old_range = old_ranges.get(color_array_name)
+    color_data_range = ranges.get(color_array_name)
+    if color_data_range and color_data_range != old_range:
+        threshold_min, threshold_max = color_data_range
+        threshold_step = (threshold_max - threshold_min) / 100
+        # widen the selection only if it still spans the whole previous range
+        if not threshold or threshold == old_range:
+            threshold_value = [threshold_min, threshold_max]
+        else:
+            threshold_value = no_update
+        threshold_marks = percentile_marks(
+            new_ranges["percentiles"].get(color_array_name)
+        )
+    else:
+        threshold_min = no_update
+        threshold_max = no_update
+        threshold_step = no_update
+        threshold_value = no_update
+        threshold_marks = no_update
+
+    return (
+        new_ranges,
+        complete,
+        threshold_min,
+        threshold_max,
+        threshold_step,
+        threshold_value,
+        threshold_marks,
+    )
+
+
+def startup_report():
+    loaded = [name for name in STARTUP_REPORT_MODULES if name in sys.modules]
+    # ru_maxrss is in KiB on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    logger.info(
+        "startup: role=%s imports=%.2fs peak_rss=%.0fMiB loaded=%s",
+        WORK_ROLE or "all",
+        time.perf_counter() - IMPORT_START,
+        peak_rss,
+        ",".join(loaded) or "-",
+    )
+
+
+startup_report()
+
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=8050)
@@ -0,0 +1,36 @@
+let preloadedFrames = null;
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    playback: {
+        showFrame: function (nIntervals, disabled, playback) {
+            const hidden = {display: "none"};
+            if (!playback || !playback.frames || !playback.frames.length) {
+                return ["", hidden];
+            }
+            const frames = playback.frames;
+            if (preloadedFrames !== frames) {
+                // warm the browser cache so playback never waits on the network
+                frames.forEach(function (src) {
+                    new Image().src = src;
+                });
+                preloadedFrames = frames;
+            }
+            if (disabled) {
+                return [window.dash_clientside.no_update, hidden];
+            }
+            const index = Math.min(nIntervals || 0, frames.length - 1);
+            return [
+                frames[index],
+                {
+                    position: "absolute",
+                    top: "3.5rem",
+                    left: 0,
+                    width: "100%",
+                    height: "calc(100% - 3.5rem)",
+                    objectFit: "contain",
+                    zIndex: 999,
+                },
+            ];
+        },
+    },
+});
@@ -0,0 +1,154 @@
+import json
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pyvista as pv
+
+
+# cells per side of the hexahedral block each dataset is cut from
+SIZES = {
+    "tiny": 8,
+    "small": 20,
+    "medium": 50,
+    "large": 100,
+}
+MANIFEST_NAME = "manifest.json"
+
+
+def make_grid(cells_per_side, seed=0, t=0.0):
+    n = cells_per_side + 1
+    grid = pv.ImageData(dimensions=(n, n, n), spacing=(1 / cells_per_side,) * 3)
+    grid = grid.cast_to_unstructured_grid()
+    rng = np.random.default_rng(seed)
+    points = grid.points
+    phase = 2 * np.pi * t
+    grid.point_data["pressure"] = np.sin(points[:, 0] * 6 + phase) * np.cos(
+        points[:, 1] * 4
+    ) + rng.normal(scale=0.01, size=grid.n_points)
+    grid.point_data["velocity"] = np.column_stack(
+        [
+            np.cos(points[:, 1] * 5 + phase),
+            np.sin(points[:, 0] * 5 + phase),
+            points[:, 2] - 0.5,
+        ]
+    )
+    centers = grid.cell_centers().points
+    grid.cell_data["temperature"] = 300 + 50 * centers[:, 2] + 10 * np.sin(phase)
+    # symmetric tensor, as written by most solvers
+    grid.cell_data["stress"] = rng.normal(size=(grid.n_cells, 6))
+    return grid
+
+
+def split_grid(grid, n_blocks):
+    bounds = np.linspace(0, grid.n_cells, n_blocks + 1, dtype=int)
+    return [
+        grid.extract_cells(np.arange(start, stop))
+        for start, stop in zip(bounds[:-1], bounds[1:])
+    ]
+
+
+def make_multiblock(grid, depth, fanout, missing_every=3):
+    leaves = split_grid(grid, fanout**depth)
+    # leaves without an array are dropped when that array is requested
+    for i, leaf in enumerate(leaves):
+        if missing_every and i % missing_every == missing_every - 1:
+            del leaf.point_data["pressure"]
+
+    def build(level, leaves):
+        if level == depth:
+            return leaves[0]
+        block = pv.MultiBlock()
+        step = len(leaves) // fanout
+        for i in range(fanout):
+            block[f"block-{level}-{i}"] = build(
+                level + 1, leaves[i * step : (i + 1) * step]
+            )
+        return block
+
+    return build(0, leaves)
+
+
+def write_vtu(path, size):
+    make_grid(SIZES[size]).save(path)
+    return path
+
+
+def write_vtm(path, size, depth=3, fanout=2):
+    make_multiblock(make_grid(SIZES[size]), depth, fanout).save(path)
+    return path
+
+
+def write_series(path, size, steps):
+    path = Path(path)
+    slice_dir = path.with_suffix("")
+    slice_dir.mkdir(parents=True, exist_ok=True)
+    files = []
+    grid = make_grid(SIZES[size])
+    for step in range(steps):
+        t = step / max(steps - 1, 1)
+        # same mesh every step; only the fields move
+        frame = make_grid(SIZES[size], seed=step, t=t) if step else grid
+        name = f"{slice_dir.name}/step-{step:05d}.vtu"
+        frame.save(path.parent / name)
+        files.append({"name": name, "time": t})
+    with path.open("w") as f:
+        json.dump({"file-series-version": "1.0", "files": files}, f)
+    return path
+
+
+def dataset_specs(suite):
+    if suite == "quick":
+        return [
+            ("vtu", "small", {}),
+            ("vtm", "small", {"depth": 3, "fanout": 2}),
+            ("series", "tiny", {"steps": 10}),
+        ]
+    return [
+        ("vtu", "small", {}),
+        ("vtu", "medium", {}),
+        ("vtu", "large", {}),
+        ("vtm", "medium", {"depth": 3, "fanout": 2}),
+        ("vtm", "medium", {"depth": 6, "fanout": 2}),
+        ("series", "tiny", {"steps": 10}),
+        ("series", "tiny", {"steps": 500}),
+        ("series", "tiny", {"steps": 5000}),
+        ("series", "small", {"steps": 100}),
+    ]
+
+
+def dataset_name(kind, size, params):
+    suffix = "".join(f"-{key[0]}{value}" for key, value in sorted(params.items()))
+    return f"{kind}-{size}{suffix}"
+
+
+def generate(root, suite="quick"):
+    # Datasets are written once per root and reused across runs, so a
+    # baseline and a comparison measure the same files
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    manifest_path = root / MANIFEST_NAME
+    try:
+        manifest = json.loads(manifest_path.read_text())
+    except (OSError, ValueError):
+        manifest = {}
+    writers = {"vtu": write_vtu, "vtm": write_vtm, "series": write_series}
+    datasets = {}
+    for kind, size, params in dataset_specs(suite):
+        name = dataset_name(kind, size, params)
+        path = root / f"{name}.{kind}"
+        if name not in manifest or not path.exists():
+            writers[kind](path, size, **params)
+            manifest[name] = {"path": path.name, "kind": kind, "size": size, **params}
+            manifest_path.write_text(json.dumps(manifest, indent=2))
+        datasets[name] = {**manifest[name], "path": str(path)}
+    return datasets
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic benchmark data")
+    parser.add_argument("root")
+    parser.add_argument("--suite", choices=("quick", "full"), default="quick")
+    args = parser.parse_args()
+    for name, dataset in generate(args.root, args.suite).items():
+        print(name, dataset["path"])
@@ -0,0 +1,256 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import statistics
+import subprocess
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+
+DATA_DIR = os.getenv("BENCHMARK_DATA_DIR", "/tmp/mesh-viewer/benchmarks")
+REPEAT = int(os.getenv("BENCHMARK_REPEAT", 5))
+TOLERANCE = float(os.getenv("BENCHMARK_TOLERANCE", 0.1))
+VIEWPORT = {"width": 1530, "height": 1080}
+COLOR_ARRAY = "pressure"
+
+CASES = {
+    "vtu": ("read", "threshold", "mesh_state", "mesh_state_binary", "render"),
+    "vtm": ("read", "merge", "threshold", "mesh_state", "render"),
+    "series": ("read", "ranges"),
+}
+
+
+def rss_mib():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load(dataset):
+    import pyvista as pv
+    from utils import merge_vtk_datasets
+
+    return merge_vtk_datasets(pv.read(dataset["path"]))[1]
+
+
+def middle_range(grid, name):
+    low, high = grid.get_data_range(name)
+    return [low + (high - low) / 4, high - (high - low) / 4]
+
+
+def setup_read(dataset):
+    import pyvista as pv
+    from timeseries import TimeSeriesMesh
+
+    path = dataset["path"]
+    if dataset["kind"] == "series":
+        path = TimeSeriesMesh(path).slice_path(0)
+    return lambda: pv.read(path)
+
+
+def setup_merge(dataset):
+    import pyvista as pv
+    from utils import merge_vtk_datasets
+
+    datasets = pv.read(dataset["path"])
+    return lambda: merge_vtk_datasets(datasets)
+
+
+def setup_threshold(dataset):
+    from threshold import threshold_grid
+
+    grid = load(dataset)
+    threshold = middle_range(grid, COLOR_ARRAY)
+    return lambda: threshold_grid(grid, COLOR_ARRAY, threshold)
+
+
+def setup_mesh_state(dataset):
+    from dash_vtk.utils import to_mesh_state
+    from surface import outer_surface
+
+    surface = outer_surface(load(dataset))
+    return lambda: to_mesh_state(surface, COLOR_ARRAY)
+
+
+def setup_mesh_state_binary(dataset):
+    from surface import outer_surface
+    from transport import build_mesh_state
+
+    surface = outer_surface(load(dataset))
+    return lambda: build_mesh_state(surface, COLOR_ARRAY, transport="binary")
+
+
+def setup_render(dataset):
+    from representation import MeshRepresentation
+
+    grid = load(dataset)
+
+    def render():
+        # no cache key: every repeat goes through the full pipeline
+        representation = MeshRepresentation(
+            grid, COLOR_ARRAY, render_mode="static", image_format="png"
+        )
+        return representation.get_view(viewport=VIEWPORT)
+
+    return render
+
+
+def setup_ranges(dataset):
+    from timeseries import TimeSeriesMesh
+
+    def ranges():
+        time_series = TimeSeriesMesh(dataset["path"])
+        # start cold: the range index would answer every repeat after the first
+        time_series.ranges_path.unlink(missing_ok=True)
+        time_series.range_log_path.unlink(missing_ok=True)
+        return time_series.get_ranges()
+
+    return ranges
+
+
+def run_case(case, dataset, repeat):
+    # Runs in a fresh process so the peak RSS belongs to this case alone
+    start_rss = rss_mib()
+    fn = globals()[f"setup_{case}"](dataset)
+    setup_rss = rss_mib()
+    fn()  # warm up imports, plotters and caches outside the timed runs
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return {
+        "case": case,
+        "dataset": dataset["name"],
+        "repeat": repeat,
+        "durations": durations,
+        "min": min(durations),
+        "median": statistics.median(durations),
+        "mean": statistics.fmean(durations),
+        "stdev": statistics.stdev(durations) if len(durations) > 1 else 0.0,
+        "start_rss_mib": start_rss,
+        "setup_rss_mib": setup_rss,
+        "peak_rss_mib": rss_mib(),
+    }
+
+
+def environment():
+    import numpy as np
+    import pyvista as pv
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pyvista": pv.__version__,
+        "vtk": ".".join(str(i) for i in pv.vtk_version_info),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def run(datasets, cases=None, repeat=REPEAT):
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for name, dataset in datasets.items():
+        dataset = {**dataset, "name": name}
+        for case in CASES[dataset["kind"]]:
+            if cases and case not in cases:
+                continue
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(run_case, case, dataset, repeat).result()
+            print(
+                f"{case:>18} {name:<24} median {result['median'] * 1000:9.1f}ms "
+                f"peak {result['peak_rss_mib']:7.0f}MiB",
+                flush=True,
+            )
+            results.append(result)
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    previous = {(i["case"], i["dataset"]): i for i in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get((result["case"], result["dataset"]))
+        if old is None:
+            continue
+        ratio = result["median"] / old["median"] if old["median"] else float("inf")
+        memory_ratio = result["peak_rss_mib"] / old["peak_rss_mib"]
+        result["baseline"] = {
+            "median": old["median"],
+            "peak_rss_mib": old["peak_rss_mib"],
+            "ratio": ratio,
+            "memory_ratio": memory_ratio,
+        }
+        status = "ok"
+        if ratio > 1 + tolerance or memory_ratio > 1 + tolerance:
+            status = "REGRESSION"
+            regressions.append(result)
+        elif ratio < 1 - tolerance:
+            status = "faster"
+        print(
+            f"{result['case']:>18} {result['dataset']:<24} "
+            f"time x{ratio:5.2f} memory x{memory_ratio:5.2f} {status}"
+        )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the load, merge and render pipeline"
+    )
+    parser.add_argument("--suite", choices=("quick", "full"), default="quick")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--cases", help="comma separated, e.g. merge,render")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument(
+        "--no-xvfb", action="store_true", help="use the current DISPLAY as is"
+    )
+    args = parser.parse_args(argv)
+
+    from benchmarks.datasets import generate
+
+    if not args.no_xvfb:
+        from vdisplay import ensure_vdisplay
+
+        # started once here; the case processes inherit DISPLAY
+        ensure_vdisplay(force=True)
+
+    datasets = generate(args.data_dir, args.suite)
+    cases = set(args.cases.split(",")) if args.cases else None
+    report = {
+        "environment": environment(),
+        "suite": args.suite,
+        "results": run(datasets, cases=cases, repeat=args.repeat),
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report["results"], json.load(f), args.tolerance)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import os
+
+import redis
+from flask import Response, abort, request
+
+
+MIME_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "vtp": "application/octet-stream",
+}
+
+# Store an entry and drop the least recently used ones until the tier fits
+# its budget, atomically so concurrent workers agree on the total size.
+# The new entry is never the one evicted; one larger than the budget is not
+# stored at all and -1 is returned.
+LRU_PUT_SCRIPT = """
+local size = string.len(ARGV[3])
+if size > tonumber(ARGV[5]) then
+    return -1
+end
+local old = tonumber(redis.call('HGET', KEYS[2], ARGV[2]) or '0')
+redis.call('SET', ARGV[1] .. ARGV[2], ARGV[3])
+redis.call('HSET', KEYS[2], ARGV[2], size)
+redis.call('ZADD', KEYS[1], ARGV[4], ARGV[2])
+local total = redis.call('INCRBY', KEYS[3], size - old)
+local evicted = 0
+while total > tonumber(ARGV[5]) do
+    local entries = redis.call('ZRANGE', KEYS[1], 0, 1)
+    local oldest = entries[1]
+    if oldest == ARGV[2] then
+        oldest = entries[2]
+    end
+    if not oldest then
+        break
+    end
+    local oldest_size = tonumber(redis.call('HGET', KEYS[2], oldest) or '0')
+    redis.call('ZREM', KEYS[1], oldest)
+    redis.call('HDEL', KEYS[2], oldest)
+    redis.call('DEL', ARGV[1] .. oldest)
+    total = redis.call('DECRBY', KEYS[3], oldest_size)
+    evicted = evicted + 1
+end
+return evicted
+"""
+
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(os.environ["REDIS_URL"])
+    return _client
+
+
+def immutable_response(digest, extension, load):
+    # `load` returns the content named by `digest`, or None once it is gone
+    headers = {"Cache-Control": "public, max-age=31536000, immutable"}
+    if request.if_none_match.contains(digest):
+        response = Response(status=304, headers=headers)
+        response.set_etag(digest)
+        return response
+    data = load()
+    if data is None:
+        abort(404)
+    response = Response(data, mimetype=MIME_TYPES[extension], headers=headers)
+    response.set_etag(digest)
+    return response
@@ -0,0 +1,143 @@
+import os
+import threading
+from collections import OrderedDict
+
+from common import dataset_files
+from instrumentation import CACHE_LOOKUPS, CACHE_EVICTIONS
+
+
+GRID_CACHE_MAX_SIZE = int(os.getenv("GRID_CACHE_MAX_SIZE", 1024 * 1024 * 2))  # 2GB
+GRID_CACHE_MAX_ENTRIES = int(os.getenv("GRID_CACHE_MAX_ENTRIES", 32))
+
+
+def grid_size(grid):
+    # `actual_memory_size` is reported in KiB
+    if grid is None:
+        return 0
+    return grid.actual_memory_size
+
+
+class LRUCache:
+
+    def __init__(self, max_size, max_entries=None, sizeof=None, name=None):
+        self.max_size = max_size
+        self.max_entries = max_entries
+        self.sizeof = sizeof or (lambda value: 1)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # named caches export their hits, misses and evictions
+        self.name = name
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                self._count(CACHE_LOOKUPS, "miss")
+                return default
+            self.hits += 1
+            self._count(CACHE_LOOKUPS, "hit")
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            if size > self.max_size:
+                return
+            self._entries[key] = (value, size)
+            self.size += size
+            self._evict()
+
+    def pop(self, key):
+        with self._lock:
+            if key in self._entries:
+                value, size = self._entries.pop(key)
+                self.size -= size
+                return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _evict(self):
+        while self._entries and (
+            self.size > self.max_size
+            or (self.max_entries and len(self._entries) > self.max_entries)
+        ):
+            _, (_, size) = self._entries.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+            self._count(CACHE_EVICTIONS)
+
+    def _count(self, counter, *labels):
+        if self.name is not None:
+            counter.labels(self.name, *labels).inc()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size": self.size,
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class GridCache(LRUCache):
+    # Entries are `merge_vtk_datasets` results. Grids are handed out as shallow
+    # copies so in-place transforms never touch the cached instance.
+
+    def __init__(
+        self, max_size=GRID_CACHE_MAX_SIZE, max_entries=GRID_CACHE_MAX_ENTRIES
+    ):
+        super().__init__(
+            max_size,
+            max_entries=max_entries,
+            sizeof=lambda value: grid_size(value[1]),
+            name="grid",
+        )
+
+    @staticmethod
+    def make_key(filepath, slice=None, scalars=None):
+        # a multiblock file's blocks can change without the .vtm itself
+        stats = tuple(
+            (stat.st_mtime_ns, stat.st_size)
+            for stat in (i.stat() for i in dataset_files(filepath))
+        )
+        if scalars is not None and not isinstance(scalars, list):
+            scalars = [scalars]
+        return (
+            str(os.path.realpath(filepath)),
+            stats,
+            slice,
+            tuple(scalars) if scalars is not None else None,
+        )
+
+    def get_or_load(self, key, loader):
+        cached = self.get(key)
+        if cached is None:
+            cached = loader()
+            self.put(key, cached)
+        array_names, grid, has_missing = cached
+        if grid is not None:
+            grid = grid.copy(deep=False)
+        return list(array_names), grid, has_missing
+
+
+grid_cache = GridCache()
@@ -0,0 +1,23 @@
+from functools import lru_cache
+
+import pyvista as pv
+from matplotlib import colormaps
+from dash_vtk.utils import preset_as_options
+
+
+@lru_cache(maxsize=None)
+def interactive_colormap_options():
+    return [i for i in preset_as_options if i["label"] not in ("KAAMS",)]
+
+
+@lru_cache(maxsize=None)
+def static_colormap_options():
+    # built on first use: probing every matplotlib colormap takes a while
+    options = []
+    for cmap in colormaps:
+        try:
+            pv.LookupTable(cmap=cmap)
+            options.append({"label": cmap, "value": cmap})
+        except Exception:
+            pass
+    return options
@@ -0,0 +1,56 @@
+import os
+from pathlib import Path
+from typing import Union
+
+
+CGROUP_CPU_MAX = Path("/sys/fs/cgroup/cpu.max")
+
+
+def must_safe_join(
+    base_dir: Union[str, Path], sub_path: Union[str, Path], *, allow_subpath_empty=False
+) -> Path:
+    base_dir = str(base_dir)
+    sub_path = str(sub_path)
+
+    base_dir = os.path.abspath(base_dir)
+    sub_path = os.path.normpath(sub_path)
+
+    final_path = os.path.abspath(os.path.join(base_dir, sub_path))
+    common_prefix = os.path.commonprefix([base_dir, final_path])
+    if final_path == base_dir and not allow_subpath_empty:
+        raise Exception("Malicious path detected")
+    elif common_prefix == base_dir:
+        return Path(final_path)
+    else:
+        raise Exception("Malicious path detected")
+
+
+def union_range(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return [min(a[0], b[0]), max(a[1], b[1])]
+
+
+def dataset_files(path):
+    path = Path(path)
+    files = [path]
+    # multiblock files keep their blocks in a directory of the same name
+    blocks = path.with_suffix("")
+    if path.suffix == ".vtm" and blocks.is_dir():
+        files.extend(sorted(i for i in blocks.rglob("*") if i.is_file()))
+    return files
+
+
+def available_cpus():
+    # A pod's CPU limit is a CFS quota (cgroup v2); its affinity still lists
+    # every CPU of the node
+    cpus = len(os.sched_getaffinity(0))
+    try:
+        quota, period = CGROUP_CPU_MAX.read_text().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cpus
@@ -23,6 +23,9 @@ COLOR_MAP_VIEW_ID = DashIDGenerator(type="view", name="color-map")
 
 URL_LOCATION_ID = DashIDGenerator(type="location", name="url")
 PLAY_BTN_ID = DashIDGenerator(type="button", name="play")
+PRERENDER_BTN_ID = DashIDGenerator(type="button", name="prerender")
+PRERENDER_PROGRESS_ID = DashIDGenerator(type="progress", name="prerender")
+PLAYBACK_IMAGE_ID = DashIDGenerator(type="image", name="playback")
 
 ARTIFACT_STORE_ID = DashIDGenerator(type="store", name="artifact")
 OPTIONS_STORE_ID = DashIDGenerator(type="store", name="options")
@@ -30,16 +33,24 @@ ACTION_STORE_ID = DashIDWrapper(
     "action"
 )  # Use DashIDWrapper to avoid Dash's bug with `runnig` attribute
 CHECKPOINT_STORE_ID = DashIDGenerator(type="store", name="checkpoint")
+RANGES_STORE_ID = DashIDGenerator(type="store", name="ranges")
+PLAYBACK_FRAMES_STORE_ID = DashIDGenerator(type="store", name="playback-frames")
 
 
 PLAY_INTERVAL_ID = DashIDGenerator(type="interval", name="play")
+RANGES_INTERVAL_ID = DashIDGenerator(type="interval", name="ranges")
 TIME_SLIDER_ID = DashIDGenerator(type="slider", name="time")
+TIME_LABEL_ID = DashIDGenerator(type="label", name="time")
 ROTATE_X_SLIDER_ID = DashIDGenerator(type="slider", name="rotate-x")
 ROTATE_Y_SLIDER_ID = DashIDGenerator(type="slider", name="rotate-y")
 THRESHOLD_RANGE_SLIDER_LOWER_ID = DashIDGenerator(type="range-slider", name="threshold")
 THRESHOLD_INVERT_CHECKBOX_ID = DashIDGenerator(type="checkbox", name="threshold-invert")
 
 RENDER_MODE_DROPDOWN_ID = DashIDGenerator(type="dropdown", name="render-mode")
+LOD_DROPDOWN_ID = DashIDGenerator(type="dropdown", name="lod")
+POINT_BUDGET_DROPDOWN_ID = DashIDGenerator(type="dropdown", name="point-budget")
+IMAGE_FORMAT_DROPDOWN_ID = DashIDGenerator(type="dropdown", name="image-format")
+COLOR_LIMITS_DROPDOWN_ID = DashIDGenerator(type="dropdown", name="color-limits")
 COLOR_MAP_DROPDOWN_ID = DashIDGenerator(type="dropdown", name="color-map")
 COLOR_ARRAY_NAME_DROPDOWN_ID = DashIDGenerator(type="dropdown", name="color-array-name")
 REPRESENTATION_TYPE_DROPDOWN_ID = DashIDGenerator(
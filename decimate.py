@@ -0,0 +1,161 @@
+import os
+import math
+
+import numpy as np
+import pyvista as pv
+from vtkmodules.vtkFiltersCore import vtkQuadricClustering
+
+from cache import LRUCache, grid_size
+from loader import grid_key
+from lod import LOD_BUDGETS, FULL_LEVEL, point_budget
+from instrumentation import stage
+
+
+LOD_CACHE_MAX_SIZE = int(os.getenv("LOD_CACHE_MAX_SIZE", 1024 * 512))  # 512MB
+
+VOXEL_REFINE_STEPS = int(os.getenv("VOXEL_REFINE_STEPS", 4))
+
+lod_cache = LRUCache(LOD_CACHE_MAX_SIZE, sizeof=grid_size, name="lod")
+
+
+def cluster_surface(surface, budget):
+    # Quadric clustering keeps cell data, which quadric decimation drops
+    divisions = max(int(math.sqrt(budget / 2)), 8)
+    alg = vtkQuadricClustering()
+    alg.SetInputData(surface)
+    alg.SetNumberOfDivisions(divisions, divisions, divisions)
+    alg.CopyCellDataOn()
+    alg.Update()
+    return pv.wrap(alg.GetOutput())
+
+
+def decimate_surface(grid, budget, scalars=None):
+    surface = grid.extract_surface(pass_pointid=False, pass_cellid=False)
+    if surface.n_cells <= budget or surface.faces.size == 0:
+        return surface
+    surface = surface.triangulate()
+    if scalars and scalars in surface.cell_data:
+        return cluster_surface(surface, budget)
+    if scalars and scalars in surface.point_data:
+        surface.set_active_scalars(scalars, preference="point")
+    return surface.decimate(
+        1 - budget / surface.n_cells,
+        attribute_error=bool(scalars),
+        scalars=True,
+        vectors=False,
+        normals=False,
+        tcoords=False,
+        tensors=False,
+    )
+
+
+def lod_grid(grid, filepath, level, slice=None, scalars=None):
+    if level is None or level >= FULL_LEVEL:
+        return grid
+    key = (grid_key(filepath, slice=slice, scalars=scalars), scalars, level)
+    lod = lod_cache.get(key)
+    if lod is None:
+        with stage("lod", level=level) as record:
+            lod = decimate_surface(grid, LOD_BUDGETS[level], scalars=scalars)
+            record.add_grid(lod)
+        lod_cache.put(key, lod)
+    return lod.copy(deep=False)
+
+
+def voxel_index(points, size):
+    cells = np.floor((points - points.min(axis=0)) / size)
+    if np.prod(cells.max(axis=0) + 1) >= 2**62:
+        # a point far from the rest leaves the grid mostly empty: only the
+        # occupied rows, columns and layers are numbered
+        cells = np.column_stack(
+            [np.unique(column, return_inverse=True)[1].ravel() for column in cells.T]
+        )
+    cells = cells.astype(np.int64)
+    dims = cells.max(axis=0) + 1
+    if np.prod(dims.astype(np.float64)) >= 2**62:
+        _, inverse = np.unique(cells, axis=0, return_inverse=True)
+        return inverse.ravel()
+    return np.ravel_multi_index(cells.T, dims)
+
+
+def count_voxels(index):
+    return np.count_nonzero(np.diff(np.sort(index))) + 1
+
+
+def fit_voxels(points, budget):
+    # the bulk of the cloud sets the first guess, so outliers do not inflate it
+    low, high = np.percentile(points, [1, 99], axis=0)
+    extent = np.where(high > low, high - low, np.ptp(points, axis=0))
+    extent = extent[extent > 0]
+    if not len(extent):
+        return np.zeros(len(points), dtype=np.int64)
+    # Cubes filling that box hold `budget` voxels; surfaces and sparse clouds
+    # occupy fewer of them, so the size is refined on the occupied count
+    size = (np.prod(extent) / budget) ** (1 / len(extent))
+    best = None
+    for _ in range(VOXEL_REFINE_STEPS):
+        index = voxel_index(points, size)
+        n_voxels = count_voxels(index)
+        if n_voxels <= budget and (best is None or n_voxels > best[0]):
+            best = (n_voxels, index)
+        if 0.8 * budget <= n_voxels <= budget:
+            break
+        # aim inside the band; occupancy is a step function of the size
+        size *= (n_voxels / (0.9 * budget)) ** (1 / len(extent))
+    while best is None:
+        size *= 2
+        index = voxel_index(points, size)
+        if count_voxels(index) <= budget:
+            best = (None, index)
+    return best[1]
+
+
+def aggregate_voxels(values, first, inverse, counts):
+    if not np.issubdtype(values.dtype, np.floating):
+        # ids and labels cannot be averaged; keep one member of each voxel
+        return values[first]
+    columns = values.reshape(len(values), -1)
+    sums = np.column_stack(
+        [
+            np.bincount(inverse, weights=column, minlength=len(counts))
+            for column in columns.T
+        ]
+    )
+    mean = sums / counts[:, None]
+    return mean.reshape((len(counts),) + values.shape[1:]).astype(values.dtype)
+
+
+def voxel_downsample(grid, budget, scalars=None):
+    if scalars and scalars not in grid.point_data and scalars in grid.cell_data:
+        grid = grid.cell_data_to_point_data()
+    points = np.asarray(grid.points)
+    _, first, inverse, counts = np.unique(
+        fit_voxels(points.astype(np.float64), budget),
+        return_index=True,
+        return_inverse=True,
+        return_counts=True,
+    )
+    inverse = inverse.ravel()
+    # one vertex per occupied voxel, at the centroid of its points
+    cloud = pv.PolyData(aggregate_voxels(points, first, inverse, counts))
+    for name in grid.point_data.keys():
+        cloud.point_data[name] = aggregate_voxels(
+            np.asarray(grid.point_data[name]), first, inverse, counts
+        )
+    if scalars and scalars in cloud.point_data:
+        cloud.set_active_scalars(scalars, preference="point")
+    return cloud
+
+
+def point_cloud_grid(grid, filepath, option, slice=None, scalars=None):
+    budget = point_budget(option, grid.n_points)
+    if budget is None:
+        return grid
+    key = (grid_key(filepath, slice=slice, scalars=scalars), scalars, "voxel", budget)
+    cloud = lod_cache.get(key)
+    if cloud is None:
+        with stage("voxel", budget=budget) as record:
+            cloud = voxel_downsample(grid, budget, scalars=scalars)
+            record.add_grid(cloud)
+        lod_cache.put(key, cloud)
+    return cloud.copy(deep=False)
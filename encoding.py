@@ -0,0 +1,81 @@
+import os
+import time
+import base64
+from io import BytesIO
+from collections import namedtuple
+
+from PIL import Image
+
+from instrumentation import stage
+
+
+STATIC_IMAGE_FORMAT = os.getenv("STATIC_IMAGE_FORMAT", "png")
+PLAYBACK_IMAGE_FORMAT = os.getenv("PLAYBACK_IMAGE_FORMAT", "jpeg")
+PNG_COMPRESS_LEVEL = int(os.getenv("PNG_COMPRESS_LEVEL", 1))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", 85))
+PLAYBACK_DOWNSCALE = float(os.getenv("PLAYBACK_DOWNSCALE", 1.0))
+
+AUTO_FORMAT = "auto"
+MIME_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+EncodedImage = namedtuple("EncodedImage", ["data", "format", "size", "encode_time"])
+
+
+def image_format_options():
+    return [{"label": "Auto", "value": AUTO_FORMAT}] + [
+        {"label": name.upper(), "value": name} for name in MIME_TYPES
+    ]
+
+
+def select_encoder(image_format=AUTO_FORMAT, playing=False):
+    if not image_format or image_format == AUTO_FORMAT:
+        image_format = PLAYBACK_IMAGE_FORMAT if playing else STATIC_IMAGE_FORMAT
+    return {
+        "image_format": image_format,
+        "downscale": PLAYBACK_DOWNSCALE if playing else 1.0,
+    }
+
+
+def encode_image(
+    image_array,
+    image_format="png",
+    quality=IMAGE_QUALITY,
+    compress_level=PNG_COMPRESS_LEVEL,
+    downscale=1.0,
+):
+    with stage("encode", format=image_format) as record:
+        start = time.perf_counter()
+        image = Image.fromarray(image_array)
+        if downscale and downscale != 1.0:
+            image = image.resize(
+                (
+                    max(int(image.width * downscale), 1),
+                    max(int(image.height * downscale), 1),
+                ),
+                Image.BILINEAR,
+            )
+        buffer = BytesIO()
+        if image_format == "png":
+            image.save(buffer, format="PNG", compress_level=compress_level)
+        elif image_format == "jpeg":
+            image.convert("RGB").save(buffer, format="JPEG", quality=quality)
+        elif image_format == "webp":
+            image.save(buffer, format="WEBP", quality=quality, method=0)
+        else:
+            raise ValueError(f"Unsupported image format {image_format}")
+        data = buffer.getvalue()
+        encoded = EncodedImage(
+            data, image_format, image.size, time.perf_counter() - start
+        )
+        record["payload_bytes"] = len(data)
+        record["size"] = image.size
+    return encoded
+
+
+def to_data_uri(encoded):
+    data = base64.b64encode(encoded.data).decode("utf-8")
+    return f"data:{MIME_TYPES[encoded.format]};base64,{data}"
@@ -0,0 +1,264 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from collections import namedtuple
+
+import redis
+from flask import abort, jsonify
+
+from blobs import LRU_PUT_SCRIPT, MIME_TYPES, get_client, immutable_response
+from instrumentation import FRAME_CACHE_EVENTS
+
+
+FRAME_CACHE_DIR = os.getenv("FRAME_CACHE_DIR", "/tmp/mesh-viewer/frames")
+FRAME_CACHE_DISK_SIZE = int(
+    os.getenv("FRAME_CACHE_DISK_SIZE", 1024 * 1024 * 1024)
+)  # bytes
+FRAME_CACHE_REDIS_SIZE = int(
+    os.getenv("FRAME_CACHE_REDIS_SIZE", 512 * 1024 * 1024)
+)  # bytes
+FRAME_KEY_PREFIX = "mesh-viewer:frame:"
+FRAME_INDEX_KEY = "mesh-viewer:frames:index"
+FRAME_SIZES_KEY = "mesh-viewer:frames:sizes"
+FRAME_TOTAL_KEY = "mesh-viewer:frames:total"
+FRAME_URL_PREFIX = "/frames/"
+FRAME_NAME_PATTERN = re.compile(r"([0-9a-f]{64})\.(%s)" % "|".join(MIME_TYPES))
+# a pre-rendered series must fit well within the shared tier, or its first
+# frames are evicted before the browser has fetched them
+PRERENDER_MAX_BYTES = int(
+    os.getenv("PRERENDER_MAX_BYTES", FRAME_CACHE_REDIS_SIZE // 4)
+)  # bytes
+
+logger = logging.getLogger(__name__)
+
+# `format` is an image format or "vtp" for meshes served by URL
+Frame = namedtuple("Frame", ["format", "data", "color_data_range"])
+
+
+def make_frame_key(*parts):
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+def dump_frame(frame):
+    # a JSON header line, then the raw bytes: nothing read back from the
+    # shared tier is ever executed
+    color_data_range = frame.color_data_range
+    if color_data_range is not None:
+        color_data_range = [float(i) for i in color_data_range]
+    header = {"format": frame.format, "color_data_range": color_data_range}
+    return json.dumps(header).encode() + b"\n" + frame.data
+
+
+def load_frame(data):
+    header, _, payload = data.partition(b"\n")
+    header = json.loads(header)
+    if header["format"] not in MIME_TYPES:
+        raise ValueError(f"Unknown frame format {header['format']}")
+    return Frame(header["format"], payload, header["color_data_range"])
+
+
+class DiskFrameStore:
+
+    def __init__(self, root=FRAME_CACHE_DIR, max_size=FRAME_CACHE_DISK_SIZE):
+        self.root = Path(root)
+        self.max_size = max_size
+        self.size = None
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        return self.root / key[:2] / f"{key}.frame"
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        try:
+            # the modification time doubles as the LRU clock
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        path = self.path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("cannot write frame %s: %s", path, e)
+            return
+        with self._lock:
+            if self.size is None:
+                self.size = sum(size for _, size, _ in self._entries())
+            else:
+                self.size += len(data)
+            if self.size > self.max_size:
+                self._evict()
+
+    def _entries(self):
+        entries = []
+        for path in self.root.glob("*/*.frame"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        # trim below the budget so the directory is not rescanned on every put
+        target = self.max_size * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        self.size = total
+
+
+class RedisFrameStore:
+
+    def __init__(self, max_size=FRAME_CACHE_REDIS_SIZE):
+        self.max_size = max_size
+        self._put_script = None
+
+    def get(self, key):
+        # one round trip; the LRU clock only moves for entries still indexed
+        with get_client().pipeline(transaction=False) as pipe:
+            pipe.get(FRAME_KEY_PREFIX + key)
+            pipe.zadd(FRAME_INDEX_KEY, {key: time.time()}, xx=True)
+            data, _ = pipe.execute()
+        return data
+
+    def put(self, key, data):
+        client = get_client()
+        if self._put_script is None:
+            self._put_script = client.register_script(LRU_PUT_SCRIPT)
+        return self._put_script(
+            keys=[FRAME_INDEX_KEY, FRAME_SIZES_KEY, FRAME_TOTAL_KEY],
+            args=[FRAME_KEY_PREFIX, key, data, time.time(), self.max_size],
+        )
+
+
+class FrameCache:
+    # Rendered frames shared by every worker: a local disk tier in front of a
+    # Redis tier, both LRU within a byte budget
+
+    def __init__(self, disk=None, shared=None):
+        self.disk = disk or DiskFrameStore()
+        self.shared = shared or RedisFrameStore()
+        self.disk_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+        FRAME_CACHE_EVENTS.labels(name).inc()
+
+    def get(self, key):
+        data = self.disk.get(key)
+        hit = "disk_hits"
+        if data is None:
+            hit = "shared_hits"
+            try:
+                data = self.shared.get(key)
+            except redis.RedisError as e:
+                logger.warning("frame cache unavailable: %s", e)
+            if data is not None:
+                self.disk.put(key, data)
+        frame = None
+        if data is not None:
+            try:
+                frame = load_frame(data)
+            except (ValueError, KeyError, TypeError) as e:
+                # written by an older release; rendered again and replaced
+                logger.warning("cannot read frame %s: %s", key, e)
+        self._count(hit if frame is not None else "misses")
+        return frame
+
+    def put(self, key, frame):
+        data = dump_frame(frame)
+        self.disk.put(key, data)
+        try:
+            self.shared.put(key, data)
+        except redis.RedisError as e:
+            logger.warning("frame cache unavailable: %s", e)
+        self._count("stores")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.disk_hits + self.shared_hits + self.misses
+            return {
+                "disk_hits": self.disk_hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "hit_rate": (
+                    (self.disk_hits + self.shared_hits) / lookups if lookups else None
+                ),
+                "disk_size": self.disk.size,
+                "disk_evictions": self.disk.evictions,
+            }
+
+
+def shared_frame_stats():
+    # hits and misses are exported per worker as Prometheus counters
+    client = get_client()
+    with client.pipeline(transaction=False) as pipe:
+        pipe.zcard(FRAME_INDEX_KEY)
+        pipe.get(FRAME_TOTAL_KEY)
+        entries, size = pipe.execute()
+    return {"shared_entries": entries, "shared_size": int(size or 0)}
+
+
+def register_frame_stats_route(server):
+    @server.route("/metrics/frames")
+    def frame_stats():
+        return jsonify(shared_frame_stats())
+
+    return frame_stats
+
+
+def frame_url(key, frame):
+    return f"{FRAME_URL_PREFIX}{key}.{frame.format}"
+
+
+def register_frame_route(server):
+    @server.route(f"{FRAME_URL_PREFIX}<name>")
+    def serve_frame(name):
+        match = FRAME_NAME_PATTERN.fullmatch(name)
+        if not match:
+            abort(404)
+        key, extension = match.groups()
+
+        def load():
+            frame = frame_cache.get(key)
+            if frame is None or frame.format != extension:
+                return None
+            return frame.data
+
+        return immutable_response(key, extension, load)
+
+    return serve_frame
+
+
+frame_cache = FrameCache()
@@ -0,0 +1,20 @@
+import os
+from pathlib import Path
+
+from prometheus_client import multiprocess
+
+
+# Every worker writes its samples here and /metrics sums them
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+if PROMETHEUS_MULTIPROC_DIR:
+    # the directory outlives container restarts; old samples would be summed in
+    multiproc_dir = Path(PROMETHEUS_MULTIPROC_DIR)
+    multiproc_dir.mkdir(parents=True, exist_ok=True)
+    for file in multiproc_dir.glob("*.db"):
+        file.unlink()
+
+
+def child_exit(server, worker):
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import logging
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from celery import current_task
+from flask import Response, g, request, has_request_context
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    start_http_server,
+)
+from prometheus_client import multiprocess
+
+from blobs import get_client
+
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9100))
+TIMING_TTL = int(os.getenv("TIMING_TTL", 300))
+TIMING_KEY_PREFIX = "mesh-viewer:timing:"
+
+STAGE_SECONDS = Histogram(
+    "mesh_viewer_stage_seconds",
+    "Time spent in each pipeline stage",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+STAGE_BYTES = Counter(
+    "mesh_viewer_stage_bytes",
+    "Bytes read from disk or produced by each pipeline stage",
+    ["stage", "kind"],
+)
+STAGE_CELLS = Histogram(
+    "mesh_viewer_stage_cells",
+    "Number of cells handled by each pipeline stage",
+    ["stage"],
+    buckets=(1e3, 1e4, 1e5, 1e6, 1e7, 1e8),
+)
+CACHE_LOOKUPS = Counter(
+    "mesh_viewer_cache_lookups",
+    "Lookups in the in-process caches, by result",
+    ["cache", "result"],
+)
+CACHE_EVICTIONS = Counter(
+    "mesh_viewer_cache_evictions",
+    "Entries dropped from the in-process caches to stay within their budget",
+    ["cache"],
+)
+PREFETCH_EVENTS = Counter(
+    "mesh_viewer_prefetch_events",
+    "Time series slices handled by the prefetcher, by outcome",
+    ["outcome"],
+)
+FRAME_CACHE_EVENTS = Counter(
+    "mesh_viewer_frame_cache_events",
+    "Lookups and stores in the shared frame cache, by tier and outcome",
+    ["event"],
+)
+PLOTTER_FRAMES = Counter(
+    "mesh_viewer_plotter_frames",
+    "Frames rendered off-screen, by whether the pooled actor was reused",
+    ["kind"],
+)
+
+logger = logging.getLogger("mesh_viewer.timing")
+
+# (stage, seconds) pairs of the callback being served
+_timings = ContextVar("timings", default=None)
+
+
+class StageRecord(dict):
+    # Extra fields a stage reports: `bytes_read`, `payload_bytes`, `n_cells`, ...
+
+    def add_grid(self, grid):
+        if grid is not None:
+            self["n_points"] = grid.n_points
+            self["n_cells"] = grid.n_cells
+
+
+@contextmanager
+def stage(name, **fields):
+    record = StageRecord(fields)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_SECONDS.labels(name).observe(duration)
+        for kind in ("bytes_read", "payload_bytes"):
+            if record.get(kind):
+                STAGE_BYTES.labels(name, kind).inc(record[kind])
+        if record.get("n_cells") is not None:
+            STAGE_CELLS.labels(name).observe(record["n_cells"])
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((name, duration))
+        logger.info(
+            json.dumps(
+                {"stage": name, "duration_ms": round(duration * 1000, 3), **record},
+                default=str,
+            )
+        )
+
+
+def server_timing(timings):
+    totals = {}
+    for name, duration in timings:
+        totals[name] = totals.get(name, 0.0) + duration
+    return ", ".join(
+        f"{name};dur={duration * 1000:.1f}" for name, duration in totals.items()
+    )
+
+
+def _background_result_key():
+    # Background callbacks run as `job_fn(result_key, progress_key, ...)`; the
+    # browser polls with the same key as `cacheKey`
+    if current_task and current_task.request.id and current_task.request.args:
+        return current_task.request.args[0]
+    return None
+
+
+def _publish(timings):
+    result_key = _background_result_key()
+    if result_key is None:
+        if has_request_context():
+            g.server_timings = timings
+        return
+    try:
+        get_client().set(
+            TIMING_KEY_PREFIX + result_key, json.dumps(timings), ex=TIMING_TTL
+        )
+    except Exception as e:
+        logger.warning("cannot publish timings: %s", e)
+
+
+def instrumented(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            timings = []
+            token = _timings.set(timings)
+            try:
+                with stage(name):
+                    return fn(*args, **kwargs)
+            finally:
+                _timings.reset(token)
+                _publish(timings)
+
+        return wrapper
+
+    return decorator
+
+
+def _pop_background_timings(result_key):
+    key = TIMING_KEY_PREFIX + result_key
+    try:
+        with get_client().pipeline() as pipe:
+            pipe.get(key)
+            pipe.delete(key)
+            data, _ = pipe.execute()
+    except Exception:
+        return None
+    return json.loads(data) if data else None
+
+
+def metrics_registry():
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    # gunicorn workers each hold their own samples
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def register_instrumentation(server):
+    @server.after_request
+    def add_server_timing(response):
+        if not request.path.endswith("_dash-update-component"):
+            return response
+        timings = g.pop("server_timings", None)
+        result_key = request.args.get("cacheKey")
+        if timings is None and result_key and response.status_code == 200:
+            timings = _pop_background_timings(result_key)
+        if timings:
+            response.headers["Server-Timing"] = server_timing(timings)
+        return response
+
+    @server.route("/metrics")
+    def metrics():
+        return Response(
+            generate_latest(metrics_registry()), mimetype=CONTENT_TYPE_LATEST
+        )
+
+    return metrics
+
+
+def start_metrics_server(port=METRICS_PORT):
+    # Celery workers have no web server of their own
+    try:
+        start_http_server(port)
+    except OSError as e:
+        logger.warning("metrics server not started on port %d: %s", port, e)
@@ -0,0 +1,73 @@
+from cache import LRUCache, grid_cache
+from common import dataset_files
+from sidecar import read_dataset
+from utils import merge_vtk_datasets, split_component
+from timeseries import TimeSeriesMesh, array_stats
+from instrumentation import stage
+
+
+array_stats_cache = LRUCache(1024, name="array_stats")
+
+
+def as_list(scalars):
+    if scalars is None or isinstance(scalars, list):
+        return scalars
+    return [scalars]
+
+
+def base_scalars(scalars):
+    if scalars is None:
+        return None
+    return [i.split("#")[0] for i in as_list(scalars)]
+
+
+def grid_key(filepath, slice=None, scalars=None):
+    scalars = base_scalars(scalars)
+    if slice is None:
+        return grid_cache.make_key(filepath, scalars=scalars)
+    slice_path = TimeSeriesMesh(filepath).slice_path(slice)
+    return grid_cache.make_key(slice_path, slice=slice, scalars=scalars)
+
+
+def dataset_bytes(path):
+    return sum(i.stat().st_size for i in dataset_files(path))
+
+
+def read_datasets(filepath, slice=None):
+    path = filepath if slice is None else TimeSeriesMesh(filepath).slice_path(slice)
+    with stage("read", bytes_read=dataset_bytes(path)):
+        return read_dataset(path)
+
+
+def merge_datasets(datasets, scalars=None):
+    with stage("merge") as record:
+        merged = merge_vtk_datasets(datasets, scalars=scalars)
+        record.add_grid(merged[1])
+    return merged
+
+
+def load_grid(filepath, slice=None, scalars=None):
+    # Grids are cached per base array; single components are split off the
+    # returned copy so every `name#i` shares one cache entry.
+    array_names, grid, has_missing = grid_cache.get_or_load(
+        grid_key(filepath, slice=slice, scalars=scalars),
+        lambda: merge_datasets(
+            read_datasets(filepath, slice=slice), scalars=base_scalars(scalars)
+        ),
+    )
+    for name in as_list(scalars) or []:
+        split_component(grid, name)
+    return array_names, grid, has_missing
+
+
+def load_array_stats(filepath, name, grid=None, cached_only=False):
+    # single files have no range index; their stats come from the merged grid,
+    # which holds every block carrying the array
+    key = (grid_key(filepath, scalars=name), name)
+    stats = array_stats_cache.get(key)
+    if stats is None and not cached_only:
+        if grid is None:
+            _, grid, _ = load_grid(filepath, scalars=name)
+        stats = array_stats(name, grid[name])
+        array_stats_cache.put(key, stats)
+    return stats
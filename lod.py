@@ -0,0 +1,47 @@
+import os
+
+
+LOD_BUDGETS = sorted(
+    int(i) for i in os.getenv("LOD_BUDGETS", "100000,500000,2000000").split(",")
+)  # triangles per level, coarsest first
+LOD_MEMORY_THRESHOLD = int(os.getenv("LOD_MEMORY_THRESHOLD", 1024 * 50))  # 50MB
+
+FULL_LEVEL = len(LOD_BUDGETS)
+
+
+def lod_options():
+    options = [
+        {"label": f"{budget:,} triangles", "value": level}
+        for level, budget in enumerate(LOD_BUDGETS)
+    ]
+    options.append({"label": "Full", "value": FULL_LEVEL})
+    return options
+
+
+def default_lod_level(memory_size):
+    return 0 if memory_size > LOD_MEMORY_THRESHOLD else FULL_LEVEL
+
+
+POINT_BUDGETS = sorted(
+    int(i) for i in os.getenv("POINT_BUDGETS", "250000,1000000").split(",")
+)  # points kept by voxel downsampling, coarsest first
+POINT_CLOUD_THRESHOLD = int(os.getenv("POINT_CLOUD_THRESHOLD", 2000000))  # points
+AUTO_POINT_BUDGET = int(os.getenv("AUTO_POINT_BUDGET", 500000))
+
+AUTO_POINTS = "auto"
+FULL_POINTS = 0
+
+
+def point_budget_options():
+    options = [{"label": "Auto", "value": AUTO_POINTS}]
+    options.extend(
+        {"label": f"{budget:,} points", "value": budget} for budget in POINT_BUDGETS
+    )
+    options.append({"label": "Full", "value": FULL_POINTS})
+    return options
+
+
+def point_budget(option, n_points):
+    if option == AUTO_POINTS:
+        option = AUTO_POINT_BUDGET if n_points > POINT_CLOUD_THRESHOLD else FULL_POINTS
+    return option if option and n_points > option else None
@@ -0,0 +1,197 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+import pyvista as pv
+
+from instrumentation import PLOTTER_FRAMES, stage
+
+
+PLOTTER_POOL_SIZE = int(os.getenv("PLOTTER_POOL_SIZE", 1))
+
+
+class PooledPlotter:
+
+    def __init__(self):
+        self.plotter = pv.Plotter(off_screen=True)
+        self.key = None
+        self.state = None
+        self.actor = None
+        self.orientation = None
+
+    def reset(self):
+        self.plotter.clear()
+        self.key = None
+        self.state = None
+        self.actor = None
+        self.orientation = None
+
+    def close(self):
+        self.plotter.close()
+
+
+class PlotterPool:
+
+    def __init__(self, size=PLOTTER_POOL_SIZE):
+        self.size = max(size, 1)
+        self.created = 0
+        self.frames = 0
+        self.updates = 0
+        self.last_latency = None
+        self.total_latency = 0.0
+        self._idle = []
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def acquire(self, key=None):
+        with self._condition:
+            while True:
+                # prefer the plotter that already holds this mesh
+                pooled = next((i for i in self._idle if i.key == key), None)
+                if pooled is None and self._idle:
+                    pooled = self._idle[-1]
+                if pooled is not None:
+                    self._idle.remove(pooled)
+                    break
+                if self.created < self.size:
+                    self.created += 1
+                    break
+                self._condition.wait()
+        try:
+            if pooled is None:
+                pooled = PooledPlotter()
+            yield pooled
+        except Exception:
+            if pooled is not None:
+                pooled.close()
+            with self._condition:
+                self.created -= 1
+                self._condition.notify()
+            raise
+        else:
+            with self._condition:
+                self._idle.append(pooled)
+                self._condition.notify()
+
+    def render(
+        self,
+        grid,
+        key=None,
+        mesh_kwargs=None,
+        properties=None,
+        orientation=None,
+        background_color="#000000",
+        window_size=None,
+    ):
+        mesh_kwargs = mesh_kwargs or {}
+        properties = properties or {}
+        orientation = tuple(orientation or (0, 0, 0))
+        state = repr(sorted(mesh_kwargs.items()))
+        with self.acquire(key) as pooled, stage("plot") as record:
+            start = time.perf_counter()
+            plotter = pooled.plotter
+            if key is not None and pooled.key == key and pooled.state == state:
+                # same mesh and mapping: only actor properties changed
+                for name, value in properties.items():
+                    setattr(pooled.actor.prop, name, value)
+                if pooled.orientation != orientation:
+                    pooled.actor.orientation = orientation
+                    pooled.orientation = orientation
+                    # keep the rotated mesh framed
+                    plotter.view_isometric()
+                kind = "update"
+            else:
+                new_mesh = key is None or pooled.key != key
+                pooled.reset()
+                pooled.actor = plotter.add_mesh(grid, **mesh_kwargs, **properties)
+                pooled.actor.orientation = orientation
+                if new_mesh:
+                    plotter.view_isometric()
+                pooled.key = key
+                pooled.state = state
+                pooled.orientation = orientation
+                kind = "rebuild"
+            plotter.background_color = background_color
+            image = plotter.screenshot(
+                None,
+                return_img=True,
+                transparent_background=False,
+                window_size=window_size,
+            )
+            latency = time.perf_counter() - start
+            record.add_grid(grid)
+        self._count(kind, latency)
+        return image
+
+    def render_sequence(
+        self,
+        grids,
+        on_frame,
+        key=None,
+        mesh_kwargs=None,
+        properties=None,
+        orientation=None,
+        background_color="#000000",
+        window_size=None,
+    ):
+        # One plotter for the whole sequence; the camera is fixed by the first
+        # frame so consecutive frames line up
+        mesh_kwargs = mesh_kwargs or {}
+        properties = properties or {}
+        with self.acquire(key) as pooled:
+            plotter = pooled.plotter
+            pooled.reset()
+            camera_position = None
+            for index, grid in enumerate(grids):
+                with stage("plot") as record:
+                    start = time.perf_counter()
+                    plotter.clear()
+                    actor = plotter.add_mesh(
+                        grid, reset_camera=False, **mesh_kwargs, **properties
+                    )
+                    actor.orientation = tuple(orientation or (0, 0, 0))
+                    if camera_position is None:
+                        plotter.view_isometric()
+                        camera_position = plotter.camera_position
+                    else:
+                        plotter.camera_position = camera_position
+                    plotter.background_color = background_color
+                    image = plotter.screenshot(
+                        None,
+                        return_img=True,
+                        transparent_background=False,
+                        window_size=window_size,
+                    )
+                    latency = time.perf_counter() - start
+                    record.add_grid(grid)
+                self._count("sequence", latency)
+                on_frame(index, image)
+            # the next `render` must not mistake the last frame for its mesh
+            pooled.reset()
+
+    def _count(self, kind, latency):
+        with self._condition:
+            self.frames += 1
+            if kind == "update":
+                self.updates += 1
+            self.last_latency = latency
+            self.total_latency += latency
+        PLOTTER_FRAMES.labels(kind).inc()
+
+    def stats(self):
+        with self._condition:
+            return {
+                "size": self.size,
+                "created": self.created,
+                "idle": len(self._idle),
+                "frames": self.frames,
+                "updates": self.updates,
+                "last_latency": self.last_latency,
+                "mean_latency": (
+                    self.total_latency / self.frames if self.frames else None
+                ),
+            }
+
+
+plotter_pool = PlotterPool()
@@ -0,0 +1,123 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import grid_cache
+from instrumentation import PREFETCH_EVENTS
+from loader import grid_key, load_grid
+from timeseries import TimeSeriesMesh
+
+
+PREFETCH_SLICES = int(os.getenv("PREFETCH_SLICES", 3))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", 2))
+
+OUTCOME_COUNTERS = {
+    "hit": "hits",
+    "wait": "waits",
+    "miss": "misses",
+    "cancelled": "cancelled",
+}
+
+
+class SlicePrefetcher:
+
+    def __init__(self, window=PREFETCH_SLICES, workers=PREFETCH_WORKERS):
+        self.window = window
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(workers, 1), thread_name_prefix="prefetch"
+        )
+        self.target = None
+        self.pending = {}
+        self.prefetched = set()
+        self.hits = 0
+        self.waits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self._lock = threading.Lock()
+
+    def schedule(self, filepath, slice, direction=1, scalars=None):
+        if self.window <= 0:
+            return
+        target = (str(filepath), scalars)
+        n_slices = TimeSeriesMesh(filepath).n_slices
+        direction = -1 if direction < 0 else 1
+        slices = [
+            slice + direction * i
+            for i in range(1, self.window + 1)
+            if 0 <= slice + direction * i < n_slices
+        ]
+        keys = {grid_key(filepath, slice=i, scalars=scalars): i for i in slices}
+        with self._lock:
+            if target != self.target:
+                self._cancel()
+                self.target = target
+            # drop everything that fell out of the window
+            for key in list(self.pending):
+                if key not in keys and self.pending.pop(key).cancel():
+                    self._count("cancelled")
+            for key, i in keys.items():
+                if key in self.pending or key in grid_cache:
+                    continue
+                future = self.executor.submit(load_grid, filepath, i, scalars)
+                future.add_done_callback(
+                    lambda future, key=key: self._done(key, future)
+                )
+                self.pending[key] = future
+
+    def _done(self, key, future):
+        with self._lock:
+            if self.pending.get(key) is future:
+                self.pending.pop(key)
+                if not future.cancelled() and future.exception() is None:
+                    self.prefetched.add(key)
+
+    def load(self, filepath, slice, scalars=None):
+        key = grid_key(filepath, slice=slice, scalars=scalars)
+        with self._lock:
+            future = self.pending.get(key)
+            prefetched = key in self.prefetched
+            self.prefetched.discard(key)
+        if future is not None and not future.cancelled():
+            future.exception()
+            outcome = "wait"
+        elif prefetched and key in grid_cache:
+            outcome = "hit"
+        else:
+            outcome = "miss"
+        with self._lock:
+            self._count(outcome)
+        return load_grid(filepath, slice=slice, scalars=scalars)
+
+    def _count(self, outcome):
+        # called with the lock held
+        name = OUTCOME_COUNTERS[outcome]
+        setattr(self, name, getattr(self, name) + 1)
+        PREFETCH_EVENTS.labels(outcome).inc()
+
+    def _cancel(self):
+        for future in self.pending.values():
+            if future.cancel():
+                self._count("cancelled")
+        self.pending.clear()
+        self.prefetched.clear()
+        self.target = None
+
+    def cancel(self):
+        with self._lock:
+            self._cancel()
+
+    def stats(self):
+        with self._lock:
+            served = self.hits + self.waits + self.misses
+            return {
+                "window": self.window,
+                "pending": len(self.pending),
+                "hits": self.hits,
+                "waits": self.waits,
+                "misses": self.misses,
+                "cancelled": self.cancelled,
+                "hit_rate": (self.hits + self.waits) / served if served else None,
+            }
+
+
+prefetcher = SlicePrefetcher()
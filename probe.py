@@ -0,0 +1,317 @@
+import json
+import os
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from timeseries import TimeSeriesMesh
+from instrumentation import stage
+
+
+PROBE_CHUNK_SIZE = 64 * 1024
+PROBE_SUMMARY_VERSION = 1
+
+XML_DATASET_EXTENSIONS = (".vtu", ".vtp", ".vts", ".vtr", ".vti")
+VTK_TYPE_SIZES = {
+    "Int8": 1,
+    "UInt8": 1,
+    "Int16": 2,
+    "UInt16": 2,
+    "Int32": 4,
+    "UInt32": 4,
+    "Int64": 8,
+    "UInt64": 8,
+    "Float32": 4,
+    "Float64": 8,
+    "String": 8,
+}
+
+
+def _drop_payloads(parser):
+    for _, elem in parser.read_events():
+        if elem.tag == "DataArray":
+            elem.text = None
+
+
+def read_xml_header(filepath):
+    # Parse the XML structure only, stopping before `<AppendedData>` so that
+    # raw or base64 payloads are never read from disk.
+    parser = ET.XMLPullParser(events=("end",))
+    truncated = False
+    with open(filepath, "rb") as f:
+        pending = b""
+        while True:
+            chunk = f.read(PROBE_CHUNK_SIZE)
+            data = pending + chunk
+            index = data.find(b"<AppendedData")
+            if index >= 0:
+                parser.feed(data[:index])
+                truncated = True
+                break
+            if not chunk:
+                parser.feed(data)
+                break
+            # hold back a few bytes so a tag split across chunks is still found
+            parser.feed(data[:-16])
+            pending = data[-16:]
+            _drop_payloads(parser)
+    if truncated:
+        parser.feed(b"</VTKFile>")
+    root = None
+    for _, elem in parser.read_events():
+        root = elem
+    parser.close()
+    return root
+
+
+def _piece_sizes(dataset_type, piece):
+    if "Extent" in piece.attrib:
+        extent = [int(i) for i in piece.get("Extent").split()]
+        dims = [extent[i + 1] - extent[i] + 1 for i in range(0, 6, 2)]
+        n_points = dims[0] * dims[1] * dims[2]
+        n_cells = 1
+        for dim in dims:
+            n_cells *= max(dim - 1, 1)
+        return n_points, n_cells
+    n_points = int(piece.get("NumberOfPoints", 0))
+    if dataset_type == "PolyData":
+        n_cells = sum(
+            int(piece.get(key, 0))
+            for key in (
+                "NumberOfVerts",
+                "NumberOfLines",
+                "NumberOfStrips",
+                "NumberOfPolys",
+            )
+        )
+    else:
+        n_cells = int(piece.get("NumberOfCells", 0))
+    return n_points, n_cells
+
+
+def _array_info(data_array, n_tuples):
+    n_components = int(data_array.get("NumberOfComponents", 1))
+    item_size = VTK_TYPE_SIZES.get(data_array.get("type"), 8)
+    data_range = None
+    if n_components == 1 and "RangeMin" in data_array.attrib:
+        data_range = [
+            float(data_array.get("RangeMin")),
+            float(data_array.get("RangeMax")),
+        ]
+    return {
+        "type": data_array.get("type"),
+        "components": n_components,
+        "range": data_range,
+        "nbytes": n_tuples * n_components * item_size,
+    }
+
+
+def probe_xml_dataset(filepath):
+    root = read_xml_header(filepath)
+    dataset_type = root.get("type")
+    dataset = root.find(dataset_type)
+    n_points = 0
+    n_cells = 0
+    nbytes = 0
+    arrays = {}
+    for piece in dataset.findall("Piece"):
+        piece_points, piece_cells = _piece_sizes(dataset_type, piece)
+        n_points += piece_points
+        n_cells += piece_cells
+        for association, n_tuples in (
+            ("point", piece_points),
+            ("cell", piece_cells),
+        ):
+            data = piece.find("PointData" if association == "point" else "CellData")
+            if data is None:
+                continue
+            for data_array in data.findall("DataArray"):
+                info = _array_info(data_array, n_tuples)
+                info["association"] = association
+                nbytes += info["nbytes"]
+                name = data_array.get("Name")
+                if name in arrays:
+                    info["range"] = merge_ranges(arrays[name]["range"], info["range"])
+                    info["nbytes"] += arrays[name]["nbytes"]
+                arrays[name] = info
+        points = piece.find("Points/DataArray")
+        if points is not None:
+            nbytes += _array_info(points, piece_points)["nbytes"]
+        for topology in ("Cells", "Verts", "Lines", "Strips", "Polys"):
+            offsets = piece.find(f"{topology}/DataArray[@Name='offsets']")
+            if offsets is not None and "RangeMax" in offsets.attrib:
+                # the last offset is the length of the connectivity array
+                nbytes += int(float(offsets.get("RangeMax"))) * 8
+        nbytes += piece_cells * 9
+    return {
+        "type": dataset_type,
+        "n_points": n_points,
+        "n_cells": n_cells,
+        "nbytes": nbytes,
+        "arrays": arrays,
+    }
+
+
+def merge_ranges(a, b):
+    if a is None or b is None:
+        return None
+    return [min(a[0], b[0]), max(a[1], b[1])]
+
+
+def probe_multiblock(filepath, sources):
+    root = read_xml_header(filepath)
+    blocks = []
+
+    def walk(elem, prefix):
+        for child in elem:
+            name = child.get("name") or child.get("index", "")
+            if child.tag == "DataSet" and child.get("file"):
+                block_path = Path(filepath).parent / child.get("file")
+                block = probe_file(block_path, sources)
+                if block is None:
+                    raise ValueError(f"Cannot probe block {block_path}")
+                for leaf in block.get("blocks") or [block]:
+                    leaf["name"] = "/".join(
+                        i for i in (f"{prefix}{name}", leaf.get("name")) if i
+                    )
+                    blocks.append(leaf)
+            elif child.tag in ("Block", "Piece"):
+                walk(child, f"{prefix}{name}/")
+
+    walk(root.find("vtkMultiBlockDataSet"), "")
+    return blocks
+
+
+def probe_file(filepath, sources):
+    filepath = Path(filepath)
+    suffix = filepath.suffix.lower()
+    if suffix not in XML_DATASET_EXTENSIONS + (".vtm",):
+        return None
+    stat = filepath.stat()
+    sources[str(filepath)] = [stat.st_mtime_ns, stat.st_size]
+    if suffix == ".vtm":
+        return {"blocks": probe_multiblock(filepath, sources)}
+    return probe_xml_dataset(filepath)
+
+
+def summarize_blocks(blocks):
+    arrays = {}
+    for block in blocks:
+        for name, info in block["arrays"].items():
+            if name not in arrays:
+                arrays[name] = dict(info, blocks=0)
+            else:
+                arrays[name]["range"] = merge_ranges(
+                    arrays[name]["range"], info["range"]
+                )
+                arrays[name]["nbytes"] += info["nbytes"]
+            arrays[name]["blocks"] += 1
+
+    # mirror the naming of `merge_vtk_datasets`: multi-component arrays are only
+    # split into `name#i` when every block is PolyData
+    all_poly_data = all(block["type"] == "PolyData" for block in blocks)
+    array_names = []
+    for name in sorted(arrays):
+        n_components = arrays[name]["components"]
+        if all_poly_data and n_components > 1:
+            array_names.extend(f"{name}#{i}" for i in range(n_components))
+        else:
+            array_names.append(name)
+    return {
+        "array_names": array_names,
+        "arrays": arrays,
+        "has_missing": any(info["blocks"] < len(blocks) for info in arrays.values()),
+        "n_points": sum(block["n_points"] for block in blocks),
+        "n_cells": sum(block["n_cells"] for block in blocks),
+        # KiB, same unit as `DataSet.actual_memory_size`
+        "memory_size": sum(block["nbytes"] for block in blocks) // 1024,
+        "blocks": [
+            {
+                "name": block.get("name"),
+                "type": block["type"],
+                "n_points": block["n_points"],
+                "n_cells": block["n_cells"],
+                "nbytes": block["nbytes"],
+            }
+            for block in blocks
+        ],
+    }
+
+
+def stored_range(summary, name):
+    if summary is None or name not in summary["arrays"]:
+        return None
+    return summary["arrays"][name]["range"]
+
+
+def summary_path(filepath):
+    filepath = Path(filepath)
+    return filepath.parent / f".{filepath.name}.probe.json"
+
+
+def _sources_valid(sources):
+    for path, (mtime, size) in sources.items():
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_mtime_ns != mtime or stat.st_size != size:
+            return False
+    return True
+
+
+def load_summary(filepath):
+    cache_path = summary_path(filepath)
+    try:
+        with cache_path.open() as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("version") != PROBE_SUMMARY_VERSION:
+        return None
+    if not _sources_valid(cached["sources"]):
+        return None
+    return cached["summary"]
+
+
+def save_summary(filepath, summary, sources):
+    try:
+        with summary_path(filepath).open("w") as f:
+            json.dump(
+                {
+                    "version": PROBE_SUMMARY_VERSION,
+                    "sources": sources,
+                    "summary": summary,
+                },
+                f,
+            )
+    except OSError:
+        pass
+
+
+def probe_artifact(filepath, slice=0):
+    filepath = Path(filepath)
+    summary = load_summary(filepath)
+    if summary is not None:
+        return summary
+
+    with stage("probe"):
+        sources = {}
+        try:
+            if filepath.suffix == ".series":
+                stat = filepath.stat()
+                sources[str(filepath)] = [stat.st_mtime_ns, stat.st_size]
+                time_series = TimeSeriesMesh(filepath)
+                probed = probe_file(time_series.slice_path(slice), sources)
+                n_slices = time_series.n_slices
+            else:
+                probed = probe_file(filepath, sources)
+                n_slices = None
+        except (OSError, ValueError, KeyError, AttributeError, ET.ParseError):
+            return None
+        if probed is None:
+            return None
+
+        summary = summarize_blocks(probed.get("blocks") or [probed])
+        summary["n_slices"] = n_slices
+        save_summary(filepath, summary, sources)
+        return summary
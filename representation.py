@@ -1,25 +1,23 @@
-import base64
-from PIL import Image
-from io import BytesIO
-
-from matplotlib import colors
 import pyvista as pv
-from dash import html
-from dash_vtk import GeometryRepresentation, Mesh, View
-from dash_vtk.utils import to_mesh_state
+from matplotlib import colors
+from dash import html, Patch
+from dash_vtk import GeometryRepresentation, Mesh, Reader, View
 from dash_fullscreen import DashFullscreen
+from vtkmodules.vtkCommonTransforms import vtkTransform
 
 from consts import RepresentationType, RenderMode
 from consts import VTK_VIEW_ID
+from surface import needs_surface, outer_surface
+from threshold import threshold_grid
+from transport import build_mesh_state, build_field_state, mesh_fingerprint
+from transport import MESH_TRANSPORT, polydata_bytes
+from cache import LRUCache
+from plotter_pool import plotter_pool
+from encoding import AUTO_FORMAT, encode_image, select_encoder, to_data_uri
+from frames import Frame, frame_url
 
 
-def numpy_to_base64(image_array):
-    image = Image.fromarray(image_array)
-    buffer = BytesIO()
-    image.save(buffer, format="PNG")
-    image_bytes = buffer.getvalue()
-    base64_bytes = base64.b64encode(image_bytes)
-    return base64_bytes.decode("utf-8")
+fingerprint_cache = LRUCache(4096)
 
 
 class MeshRepresentation:
@@ -40,6 +38,11 @@ class MeshRepresentation:
         representation_type=RepresentationType.Surface.value,
         threshold=None,
         enable_threshold=False,
+        invert_threshold=False,
+        cache_key=None,
+        track_topology=False,
+        image_format=AUTO_FORMAT,
+        playing=False,
     ):
         self.grid = grid
         self.color_array_name = color_array_name
@@ -55,85 +58,240 @@ class MeshRepresentation:
         self.representation_type = representation_type
         self.threshold = threshold
         self.enable_threshold = enable_threshold
+        self.invert_threshold = invert_threshold
+        self.cache_key = cache_key
+        self.track_topology = track_topology
+        self.fingerprint = None
+        self.prepared = None
+        self.image_format = image_format
+        self.playing = playing
+        self.frame_stats = None
+        self.frame = None
 
-    def get_view(self, color_data_range=None, viewport=None):
+    def prepare_grid(self):
+        if self.prepared is not None:
+            return self.prepared
         color_array_name = self.color_array_name
+        grid = self.grid
+        if self.threshold_key() is not None:
+            grid = threshold_grid(
+                grid,
+                color_array_name,
+                self.threshold,
+                invert=self.invert_threshold,
+                key=self.cache_key,
+            )
+        if needs_surface(grid, self.representation_type):
+            surface_key = None
+            if self.cache_key is not None:
+                surface_key = (self.cache_key, color_array_name, self.threshold_key())
+            grid = outer_surface(grid, key=surface_key)
+        self.prepared = grid
+        return grid
 
-        color_map = self.color_map or "coolwarm"
+    def threshold_key(self):
+        if not (self.enable_threshold and self.threshold and self.color_array_name):
+            return None
+        return (tuple(self.threshold), bool(self.invert_threshold))
 
-        grid = self.grid
+    def pipeline_key(self):
+        if self.cache_key is None:
+            return None
+        return (
+            self.cache_key,
+            self.color_array_name,
+            self.threshold_key(),
+            self.representation_type,
+        )
+
+    def orientation(self):
+        # rotation is an actor transform: x first, then y. VTK and vtk.js
+        # apply an orientation as y, then x, then z, so the composed rotation
+        # is converted rather than passed as [x, y, 0]
+        transform = vtkTransform()
+        transform.PostMultiply()
+        transform.RotateX(self.rotate_x or 0)
+        transform.RotateY(self.rotate_y or 0)
+        return list(transform.GetOrientation())
+
+    @property
+    def cacheable(self):
+        # views that reference their payload by URL can be replayed from the
+        # frame cache; inline mesh states cannot
+        return self.render_mode == "static" or MESH_TRANSPORT == "url"
+
+    def window_size(self, viewport=None):
+        if self.render_mode == "static" and viewport:
+            return (viewport["width"] - 250, viewport["height"])
+        return None
+
+    def render_key(self, viewport=None):
+        if self.cache_key is None:
+            return None
+        image_format = None
+        if self.render_mode == "static":
+            image_format = select_encoder(self.image_format, playing=self.playing)
+        return (
+            self.pipeline_key(),
+            self.render_mode,
+            self.color_map,
+            self.opacity,
+            self.point_size,
+            self.line_width,
+            self.show_scalar_bar,
+            self.background_color,
+            tuple(self.orientation()),
+            image_format,
+            self.window_size(viewport),
+        )
+
+    def compute_fingerprint(self, grid):
+        key = self.pipeline_key()
+        fingerprint = fingerprint_cache.get(key) if key is not None else None
+        if fingerprint is None:
+            fingerprint = mesh_fingerprint(grid)
+            if key is not None:
+                fingerprint_cache.put(key, fingerprint)
+        return fingerprint
+
+    @staticmethod
+    def patches_field(grid):
+        # `to_mesh_state` runs anything but PolyData through a geometry filter,
+        # so the cells on screen would not line up with the grid's cell data.
+        # A `Reader` only reloads when its URL changes, so it is never patched.
+        return MESH_TRANSPORT != "url" and isinstance(grid, pv.PolyData)
+
+    def get_field_patch(self, color_data_range=None, fingerprint=None):
+        # Swap only the colour field into the mesh on screen, provided the new
+        # frame has exactly the same points and cells
+        color_array_name = self.color_array_name
         if not color_data_range and color_array_name:
-            color_data_range = grid.get_data_range(color_array_name)
-
-        if self.rotate_x:
-            grid.rotate_x(self.rotate_x, inplace=True)
-        if self.rotate_y:
-            grid.rotate_y(self.rotate_y, inplace=True)
-        if self.enable_threshold and self.threshold:
-            grid = grid.threshold(
-                self.threshold[0], self.color_array_name, invert=False, method="upper"
-            )
-            grid = grid.threshold(
-                self.threshold[1], self.color_array_name, invert=False, method="lower"
-            )
+            color_data_range = self.grid.get_data_range(color_array_name)
+        grid = self.prepare_grid()
+        if not self.patches_field(grid):
+            return None
+        self.fingerprint = self.compute_fingerprint(grid)
+        if fingerprint is None or fingerprint != self.fingerprint:
+            return None
+
+        view = Patch()
+        representation = view["props"]["children"]["props"]
+        if color_array_name:
+            field = build_field_state(grid, color_array_name)
+            if field is not None:
+                representation["children"][0]["props"]["state"]["field"] = field
+            representation["mapper"]["scalarRange"] = color_data_range
+        for key, value in self.presentation_props(color_data_range).items():
+            representation[key] = value
+        return view
+
+    def get_view(self, color_data_range=None, viewport=None, frame_key=None):
+        # with a `frame_key`, the frame goes to the frame cache under that key
+        # and the view references it by URL
+        color_array_name = self.color_array_name
+
+        if not color_data_range and color_array_name:
+            color_data_range = self.grid.get_data_range(color_array_name)
+        grid = self.prepare_grid()
 
         if self.render_mode == "static":
-            plotter = pv.Plotter(off_screen=True)
-            plotter.add_mesh(
+            image = plotter_pool.render(
                 grid,
-                opacity=self.opacity,
-                style=RepresentationType(self.representation_type).name.lower(),
-                lighting=True,
-                cmap=color_map,
-                scalars=color_array_name,
-                clim=color_data_range,
-                point_size=self.point_size,
-                line_width=self.line_width,
-                show_scalar_bar=self.show_scalar_bar,
-                scalar_bar_args=dict(
-                    title=color_array_name,
-                    vertical=True,
-                    color="white",
-                    nan_annotation=True,
-                    shadow=True,
-                ),
-                interpolate_before_map=True,
+                key=self.pipeline_key(),
+                mesh_kwargs=self.mesh_kwargs(color_data_range),
+                properties=self.actor_properties(),
+                orientation=self.orientation(),
+                background_color=self.background_color,
+                window_size=self.window_size(viewport),
             )
-            plotter.background_color = self.background_color
-            window_size = None
-            if viewport:
-                window_size = (viewport["width"] - 250, viewport["height"])
-            image = plotter.screenshot(
-                None,
-                return_img=True,
-                transparent_background=False,
-                window_size=window_size,
+            return self.static_view(
+                self.encode_frame(image, color_data_range), frame_key
             )
-            plotter.close()
-            image_base64 = numpy_to_base64(image)
-            return html.Div(
-                DashFullscreen(
-                    html.Img(
-                        src=f"data:image/png;base64,{image_base64}",
-                        style={"height": "100%", "maxWidth": "calc(100vw - 250px"},
-                    ),
-                    style={"height": "100%"},
-                ),
-                id=VTK_VIEW_ID.get_identifier(),
-                style={
-                    "height": "100%",
-                    "margin": 0,
-                    "padding": 0,
-                    "textAlign": "center",
-                    "backgroundColor": self.background_color,
-                },
+        if MESH_TRANSPORT == "url" and frame_key is not None:
+            self.frame = Frame(
+                "vtp", polydata_bytes(grid, color_array_name), color_data_range
             )
-        mesh_state = to_mesh_state(grid, color_array_name)
-        showScalarBar = (
-            self.show_scalar_bar
-            and color_array_name is not None
-            and color_data_range is not None
+            return self.view_from_frame(self.frame, frame_key)
+        if self.track_topology and self.patches_field(grid):
+            self.fingerprint = self.compute_fingerprint(grid)
+        return self.interactive_view(
+            Mesh(state=build_mesh_state(grid, color_array_name)), color_data_range
+        )
+
+    def mesh_kwargs(self, color_data_range=None):
+        return dict(
+            style=RepresentationType(self.representation_type).name.lower(),
+            lighting=True,
+            cmap=self.color_map or "coolwarm",
+            scalars=self.color_array_name,
+            clim=color_data_range,
+            show_scalar_bar=self.show_scalar_bar,
+            scalar_bar_args=dict(
+                title=self.color_array_name,
+                vertical=True,
+                color="white",
+                nan_annotation=True,
+                shadow=True,
+            ),
+            interpolate_before_map=True,
+        )
+
+    def actor_properties(self):
+        return dict(
+            opacity=self.opacity,
+            point_size=self.point_size,
+            line_width=self.line_width,
+        )
+
+    def encode_frame(self, image, color_data_range=None):
+        encoded = encode_image(
+            image, **select_encoder(self.image_format, playing=self.playing)
         )
+        self.frame_stats = {
+            "format": encoded.format,
+            "bytes": len(encoded.data),
+            "encode_time": encoded.encode_time,
+        }
+        self.frame = Frame(encoded.format, encoded.data, color_data_range)
+        return encoded
+
+    def frame_src(self, encoded, frame_key=None):
+        # takes an `EncodedImage` or a cached `Frame`; frames without a key
+        # in the frame cache are inlined
+        if frame_key is not None:
+            return frame_url(frame_key, encoded)
+        return to_data_uri(encoded)
+
+    def view_from_frame(self, frame, frame_key):
+        if frame.format == "vtp":
+            # the browser fetches the mesh itself, so identical frames come
+            # straight from its cache
+            source = Reader(
+                vtkClass="vtkXMLPolyDataReader", url=frame_url(frame_key, frame)
+            )
+            return self.interactive_view(source, frame.color_data_range)
+        return self.static_view(frame, frame_key)
+
+    def static_view(self, encoded, frame_key=None):
+        return html.Div(
+            DashFullscreen(
+                html.Img(
+                    src=self.frame_src(encoded, frame_key),
+                    style={"height": "100%", "maxWidth": "calc(100vw - 250px"},
+                ),
+                style={"height": "100%"},
+            ),
+            id=VTK_VIEW_ID.get_identifier(),
+            style={
+                "height": "100%",
+                "margin": 0,
+                "padding": 0,
+                "textAlign": "center",
+                "backgroundColor": self.background_color,
+            },
+        )
+
+    def interactive_view(self, source, color_data_range=None):
         mapper = {
             "scalarMode": 0,
             "colorMode": 1,
@@ -141,32 +299,52 @@ class MeshRepresentation:
             "interpolateScalarsBeforeMapping": True,
             "scalarRange": color_data_range,
         }
-        if color_array_name:
-            mapper["colorByArrayName"] = color_array_name
+        if self.color_array_name:
+            mapper["colorByArrayName"] = self.color_array_name
 
         return View(
             GeometryRepresentation(
                 [
-                    Mesh(state=mesh_state),
+                    source,
                 ],
-                showScalarBar=showScalarBar,
-                scalarBarTitle=(color_array_name if showScalarBar else None),
                 scalarBarStyle={
                     "automated": True,
                 },
                 mapper=mapper,
-                actor={},
-                colorMapPreset=(color_map if showScalarBar else None),
-                colorDataRange=(color_data_range if showScalarBar else None),
-                property={
-                    "edgeVisibility": False,
-                    "pointSize": self.point_size,
-                    "lineWidth": self.line_width,
-                    "opacity": self.opacity,
-                    "representation": self.representation_type,
-                },
+                **self.presentation_props(color_data_range),
             ),
             id=VTK_VIEW_ID.get_identifier(),
             background=colors.hex2color(self.background_color),
             style={"height": "100vh", "width": "100%", "margin": 0, "padding": 0},
         )
+
+    def presentation_props(self, color_data_range=None):
+        color_array_name = self.color_array_name
+        color_map = self.color_map or "coolwarm"
+        showScalarBar = (
+            self.show_scalar_bar
+            and color_array_name is not None
+            and color_data_range is not None
+        )
+        return {
+            "showScalarBar": showScalarBar,
+            "scalarBarTitle": (color_array_name if showScalarBar else None),
+            "colorMapPreset": (color_map if showScalarBar else None),
+            "colorDataRange": (color_data_range if showScalarBar else None),
+            "actor": {"orientation": self.orientation()},
+            "property": {
+                "edgeVisibility": False,
+                "pointSize": self.point_size,
+                "lineWidth": self.line_width,
+                "opacity": self.opacity,
+                "representation": self.representation_type,
+            },
+        }
+
+    def get_patch(self, color_data_range=None):
+        # Update an interactive view in place; the mesh state is left untouched
+        view = Patch()
+        view["props"]["background"] = colors.hex2color(self.background_color)
+        for key, value in self.presentation_props(color_data_range).items():
+            view["props"]["children"]["props"][key] = value
+        return view
@@ -0,0 +1,274 @@
+import os
+import json
+import shutil
+import logging
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pyvista as pv
+from vtkmodules.util.numpy_support import numpy_to_vtk, vtk_to_numpy
+from vtkmodules.util.vtkConstants import VTK_ID_TYPE, VTK_UNSIGNED_CHAR
+from vtkmodules.vtkCommonDataModel import vtkCellArray
+
+from common import dataset_files
+from timeseries import TimeSeriesMesh
+
+
+SIDECAR_ENABLED = os.getenv("SIDECAR_ENABLED", "true") == "true"
+SIDECAR_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+POLY_CELLS = ("verts", "lines", "polys", "strips")
+
+logger = logging.getLogger(__name__)
+
+
+class UnsupportedDataset(ValueError):
+    pass
+
+
+def sidecar_path(path):
+    path = Path(path)
+    return path.parent / f".{path.name}.sidecar"
+
+
+def source_stats(path):
+    path = Path(path)
+    stats = {}
+    for file in dataset_files(path):
+        stat = file.stat()
+        stats[str(file.relative_to(path.parent))] = [stat.st_mtime_ns, stat.st_size]
+    return stats
+
+
+def load_manifest(path):
+    try:
+        with (sidecar_path(path) / MANIFEST_NAME).open() as f:
+            manifest = json.load(f)
+        stats = source_stats(path)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != SIDECAR_VERSION or manifest.get("sources") != stats:
+        return None
+    return manifest
+
+
+class ArrayWriter:
+    # Every array goes to its own raw little-endian file so it can be mapped
+    # back without parsing
+
+    def __init__(self, root):
+        self.root = root
+        self.count = 0
+
+    def write(self, values):
+        values = np.ascontiguousarray(values)
+        values = values.astype(values.dtype.newbyteorder("<"), copy=False)
+        name = f"{self.count}.bin"
+        self.count += 1
+        values.tofile(self.root / name)
+        return {"file": name, "dtype": values.dtype.str, "shape": list(values.shape)}
+
+
+def cell_arrays(cells, writer):
+    return {
+        "offsets": writer.write(vtk_to_numpy(cells.GetOffsetsArray()).astype(np.int64)),
+        "connectivity": writer.write(
+            vtk_to_numpy(cells.GetConnectivityArray()).astype(np.int64)
+        ),
+    }
+
+
+def write_block(block, writer):
+    if block is None:
+        return None
+    if isinstance(block, pv.MultiBlock):
+        return {
+            "type": "MultiBlock",
+            "children": [
+                [name, write_block(block[name], writer)] for name in block.keys()
+            ],
+        }
+    if isinstance(block, pv.UnstructuredGrid):
+        if block.GetFaces() is not None:
+            raise UnsupportedDataset("polyhedral cells")
+        entry = {
+            "type": "UnstructuredGrid",
+            "points": writer.write(block.points),
+            "offsets": writer.write(block.offset.astype(np.int64)),
+            "connectivity": writer.write(block.cell_connectivity.astype(np.int64)),
+            "celltypes": writer.write(block.celltypes.astype(np.uint8)),
+        }
+    elif isinstance(block, pv.PolyData):
+        entry = {"type": "PolyData", "points": writer.write(block.points)}
+        for kind in POLY_CELLS:
+            cells = getattr(block, f"Get{kind.capitalize()}")()
+            if cells.GetNumberOfCells():
+                entry[kind] = cell_arrays(cells, writer)
+    elif isinstance(block, pv.StructuredGrid):
+        entry = {
+            "type": "StructuredGrid",
+            "dimensions": list(block.dimensions),
+            "points": writer.write(block.points),
+        }
+    elif isinstance(block, pv.ImageData):
+        entry = {
+            "type": "ImageData",
+            "dimensions": list(block.dimensions),
+            "origin": list(block.origin),
+            "spacing": list(block.spacing),
+        }
+    else:
+        raise UnsupportedDataset(type(block).__name__)
+    for attribute in ("point_data", "cell_data"):
+        data = getattr(block, attribute)
+        arrays = {}
+        for name in data.keys():
+            values = np.asarray(data[name])
+            if not np.issubdtype(values.dtype, np.number):
+                raise UnsupportedDataset(f"{attribute} array {name} ({values.dtype})")
+            arrays[name] = writer.write(values)
+        entry[attribute] = {"arrays": arrays, "active": data.active_scalars_name}
+    return entry
+
+
+def map_array(root, entry):
+    shape = tuple(entry["shape"])
+    if not np.prod(shape):
+        return np.empty(shape, dtype=entry["dtype"])
+    # copy-on-write: VTK may modify arrays in place, the sidecar never changes
+    return np.memmap(root / entry["file"], dtype=entry["dtype"], mode="c", shape=shape)
+
+
+def id_array(values):
+    # vtkCellArray.SetData shares the buffer but drops the array holding the
+    # mapping, so cells are copied out of the sidecar
+    return numpy_to_vtk(values, deep=True, array_type=VTK_ID_TYPE)
+
+
+def cell_array(root, entry):
+    cells = vtkCellArray()
+    cells.SetData(
+        id_array(map_array(root, entry["offsets"])),
+        id_array(map_array(root, entry["connectivity"])),
+    )
+    return cells
+
+
+def read_block(root, entry):
+    if entry is None:
+        return None
+    if entry["type"] == "MultiBlock":
+        block = pv.MultiBlock()
+        for name, child in entry["children"]:
+            block.append(read_block(root, child), name)
+        return block
+    if entry["type"] == "UnstructuredGrid":
+        block = pv.UnstructuredGrid()
+        block.SetPoints(pv.vtk_points(map_array(root, entry["points"]), deep=False))
+        block.SetCells(
+            numpy_to_vtk(
+                map_array(root, entry["celltypes"]),
+                deep=False,
+                array_type=VTK_UNSIGNED_CHAR,
+            ),
+            cell_array(root, entry),
+        )
+    elif entry["type"] == "PolyData":
+        block = pv.PolyData()
+        block.SetPoints(pv.vtk_points(map_array(root, entry["points"]), deep=False))
+        for kind in POLY_CELLS:
+            if kind in entry:
+                getattr(block, f"Set{kind.capitalize()}")(cell_array(root, entry[kind]))
+    elif entry["type"] == "StructuredGrid":
+        block = pv.StructuredGrid()
+        block.SetDimensions(entry["dimensions"])
+        block.SetPoints(pv.vtk_points(map_array(root, entry["points"]), deep=False))
+    else:
+        block = pv.ImageData(
+            dimensions=entry["dimensions"],
+            origin=entry["origin"],
+            spacing=entry["spacing"],
+        )
+    for attribute in ("point_data", "cell_data"):
+        data = getattr(block, attribute)
+        for name, array in entry[attribute]["arrays"].items():
+            data.set_array(map_array(root, array), name)
+        if entry[attribute]["active"] is not None:
+            data.active_scalars_name = entry[attribute]["active"]
+    return block
+
+
+def load_sidecar(path):
+    manifest = load_manifest(path)
+    if manifest is None or manifest.get("unsupported"):
+        return None
+    try:
+        return read_block(sidecar_path(path), manifest["dataset"])
+    except (OSError, ValueError, KeyError) as e:
+        # replaced underneath us; the caller falls back to parsing
+        logger.warning("cannot map sidecar of %s: %s", path, e)
+        return None
+
+
+def read_dataset(path):
+    if SIDECAR_ENABLED:
+        dataset = load_sidecar(path)
+        if dataset is not None:
+            return dataset
+    return pv.read(path)
+
+
+def ingest_file(path, force=False):
+    path = Path(path)
+    if not force and load_manifest(path) is not None:
+        return False
+    target = sidecar_path(path)
+    tmp_path = target.with_name(f"{target.name}.{os.getpid()}")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir()
+    try:
+        sources = source_stats(path)
+        manifest = {"version": SIDECAR_VERSION, "sources": sources}
+        try:
+            manifest["dataset"] = write_block(pv.read(path), ArrayWriter(tmp_path))
+        except UnsupportedDataset as e:
+            # remembered, so the file is not parsed again until it changes
+            for file in tmp_path.glob("*.bin"):
+                file.unlink()
+            manifest["unsupported"] = str(e)
+        with (tmp_path / MANIFEST_NAME).open("w") as f:
+            json.dump(manifest, f)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp_path, target)
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return "unsupported" not in manifest
+
+
+def ingest(path, force=False):
+    path = Path(path)
+    if path.suffix == ".series":
+        time_series = TimeSeriesMesh(path)
+        return sum(
+            ingest_file(time_series.slice_path(i), force=force)
+            for i in range(time_series.n_slices)
+        )
+    return int(ingest_file(path, force=force))
+
+
+def has_sidecar(path, slice=None):
+    if slice is not None:
+        path = TimeSeriesMesh(path).slice_path(slice)
+    return load_manifest(path) is not None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write memory-mapped sidecars for .vtu, .vtm and .series files"
+    )
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--force", action="store_true", help="rewrite valid sidecars")
+    args = parser.parse_args()
+    for path in args.paths:
+        print(path, ingest(path, force=args.force))
@@ -0,0 +1,31 @@
+import os
+
+import pyvista as pv
+
+from cache import LRUCache, grid_size
+from consts import RepresentationType
+from instrumentation import stage
+
+
+SURFACE_CACHE_MAX_SIZE = int(os.getenv("SURFACE_CACHE_MAX_SIZE", 1024 * 512))  # 512MB
+
+surface_cache = LRUCache(SURFACE_CACHE_MAX_SIZE, sizeof=grid_size, name="surface")
+
+
+def needs_surface(grid, representation_type):
+    return isinstance(grid, pv.UnstructuredGrid) and RepresentationType(
+        representation_type
+    ) in (RepresentationType.Surface, RepresentationType.Wireframe)
+
+
+def outer_surface(grid, key=None):
+    # Only the hull is visible with surface representations; interior cells and
+    # the points they use never need to leave the worker.
+    surface = surface_cache.get(key) if key is not None else None
+    if surface is None:
+        with stage("surface") as record:
+            surface = grid.extract_surface(pass_pointid=False, pass_cellid=False)
+            record.add_grid(surface)
+        if key is not None:
+            surface_cache.put(key, surface)
+    return surface.copy(deep=False)
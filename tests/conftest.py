@@ -0,0 +1,12 @@
+import pytest
+
+
+@pytest.fixture(scope="session")
+def vdisplay():
+    # off-screen plotters need an X server, as in the workers
+    from vdisplay import ensure_vdisplay
+
+    try:
+        ensure_vdisplay(force=False)
+    except OSError as e:
+        pytest.skip(f"no virtual display: {e}")
@@ -0,0 +1,27 @@
+import os
+
+from benchmarks.datasets import make_grid, write_vtm
+from cache import GridCache
+from loader import load_grid
+
+
+def test_key_changes_with_block_files(tmp_path):
+    path = write_vtm(tmp_path / "case.vtm", "tiny", depth=1, fanout=2)
+    key = GridCache.make_key(path)
+    assert GridCache.make_key(path) == key
+    block = next((tmp_path / "case").rglob("*.vtu"))
+    stat = block.stat()
+    os.utime(block, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert GridCache.make_key(path) != key
+
+
+def test_rewritten_block_is_reloaded(tmp_path):
+    path = write_vtm(tmp_path / "case.vtm", "tiny", depth=1, fanout=2)
+    _, grid, _ = load_grid(path, scalars="temperature")
+    block = sorted((tmp_path / "case").rglob("*.vtu"))[0]
+    replacement = make_grid(2)
+    replacement.save(block)
+    stat = block.stat()
+    os.utime(block, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    _, reloaded, _ = load_grid(path, scalars="temperature")
+    assert reloaded.n_cells != grid.n_cells
@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+import common
+from common import available_cpus
+
+
+@pytest.mark.parametrize(
+    "cpu_max, expected",
+    [("200000 100000\n", 2), ("50000 100000\n", 1), ("max 100000\n", None)],
+)
+def test_available_cpus_follow_the_quota(tmp_path, monkeypatch, cpu_max, expected):
+    path = tmp_path / "cpu.max"
+    path.write_text(cpu_max)
+    monkeypatch.setattr(common, "CGROUP_CPU_MAX", path)
+    cpus = len(os.sched_getaffinity(0))
+    assert available_cpus() == min(cpus, expected or cpus)
+
+
+def test_available_cpus_without_cgroup(tmp_path, monkeypatch):
+    monkeypatch.setattr(common, "CGROUP_CPU_MAX", tmp_path / "missing")
+    assert available_cpus() == len(os.sched_getaffinity(0))
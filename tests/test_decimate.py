@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+import pyvista as pv
+
+from decimate import voxel_downsample, voxel_index, count_voxels
+
+
+def make_cloud(n_points, seed=0):
+    rng = np.random.default_rng(seed)
+    cloud = pv.PolyData(rng.random((n_points, 3)))
+    cloud.point_data["pressure"] = rng.random(n_points)
+    cloud.point_data["velocity"] = rng.random((n_points, 3))
+    cloud.point_data["label"] = np.arange(n_points, dtype=np.int32)
+    return cloud
+
+
+def test_voxel_index_matches_unique_cells():
+    rng = np.random.default_rng(1)
+    points = rng.random((10000, 3))
+    index = voxel_index(points, 0.1)
+    cells = np.floor((points - points.min(axis=0)) / 0.1).astype(np.int64)
+    _, expected = np.unique(cells, axis=0, return_inverse=True)
+    assert count_voxels(index) == expected.max() + 1
+    # same partition of the points, whatever the numbering
+    pairs = np.unique(np.column_stack([index, expected.ravel()]), axis=0)
+    assert len(pairs) == count_voxels(index)
+
+
+def test_voxel_downsample_fits_budget():
+    cloud = make_cloud(200000)
+    reduced = voxel_downsample(cloud, 20000, scalars="pressure")
+    assert 0.5 * 20000 <= reduced.n_points <= 20000
+    assert reduced.active_scalars_name == "pressure"
+    assert reduced.point_data["velocity"].shape == (reduced.n_points, 3)
+    assert reduced.point_data["label"].dtype == np.int32
+    low, high = cloud.get_data_range("pressure")
+    assert low <= reduced.point_data["pressure"].min()
+    assert reduced.point_data["pressure"].max() <= high
+
+
+@pytest.mark.parametrize("distance", [1e5, 1e6, 1e18])
+def test_voxel_downsample_with_outlier(distance):
+    cloud = make_cloud(1000000)
+    points = np.vstack([cloud.points, [[distance] * 3]])
+    outlier = pv.PolyData(points)
+    outlier.point_data["pressure"] = np.append(cloud.point_data["pressure"], 0.5)
+    reduced = voxel_downsample(outlier, 50000, scalars="pressure")
+    assert 0.5 * 50000 <= reduced.n_points <= 50000
+    # the outlier is kept as a voxel of its own
+    assert np.isclose(reduced.points.max(), distance)
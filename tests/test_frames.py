@@ -0,0 +1,32 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from frames import DiskFrameStore, Frame, dump_frame, load_frame
+
+
+class Exploit:
+    def __reduce__(self):
+        return (os.system, ("touch pwned",))
+
+
+def test_frame_round_trip(tmp_path):
+    frame = Frame("png", b"\x89PNG\n\x00data", (np.float32(0.5), np.float64(2.0)))
+    store = DiskFrameStore(tmp_path)
+    store.put("ab" * 32, dump_frame(frame))
+    loaded = load_frame(store.get("ab" * 32))
+    assert loaded == Frame("png", frame.data, [0.5, 2.0])
+    assert load_frame(dump_frame(frame._replace(color_data_range=None))) == (
+        Frame("png", frame.data, None)
+    )
+
+
+def test_pickled_frame_is_rejected(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError):
+        load_frame(pickle.dumps(Exploit()))
+    with pytest.raises(ValueError):
+        load_frame(b'{"format": "exe", "color_data_range": null}\nMZ')
+    assert not (tmp_path / "pwned").exists()
@@ -0,0 +1,70 @@
+import pyvista as pv
+from prometheus_client import REGISTRY
+
+from benchmarks.datasets import write_series
+from cache import LRUCache
+from plotter_pool import PlotterPool
+from prefetch import SlicePrefetcher
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(f"{name}_total", labels) or 0
+
+
+def test_cache_counters():
+    cache = LRUCache(2, name="test")
+    before = {
+        result: sample("mesh_viewer_cache_lookups", cache="test", result=result)
+        for result in ("hit", "miss")
+    }
+    evictions = sample("mesh_viewer_cache_evictions", cache="test")
+    cache.get("a")
+    cache.put("a", 1)
+    cache.get("a")
+    cache.put("b", 2)
+    cache.put("c", 3)
+    assert sample("mesh_viewer_cache_lookups", cache="test", result="hit") == (
+        before["hit"] + 1
+    )
+    assert sample("mesh_viewer_cache_lookups", cache="test", result="miss") == (
+        before["miss"] + 1
+    )
+    assert sample("mesh_viewer_cache_evictions", cache="test") == evictions + 1
+
+
+def test_prefetch_counters(tmp_path):
+    path = write_series(tmp_path / "case.series", "tiny", 4)
+    prefetcher = SlicePrefetcher(window=2, workers=1)
+    before = {
+        outcome: sample("mesh_viewer_prefetch_events", outcome=outcome)
+        for outcome in ("hit", "wait", "miss")
+    }
+    prefetcher.load(path, 0)
+    prefetcher.schedule(path, 0)
+    prefetcher.load(path, 1)
+    after = {
+        outcome: sample("mesh_viewer_prefetch_events", outcome=outcome)
+        for outcome in ("hit", "wait", "miss")
+    }
+    assert after["miss"] == before["miss"] + 1
+    assert after["hit"] + after["wait"] == before["hit"] + before["wait"] + 1
+    stats = prefetcher.stats()
+    assert stats["misses"] == 1 and stats["hits"] + stats["waits"] == 1
+
+
+def test_plotter_counters(vdisplay):
+    pool = PlotterPool(size=1)
+    before = {
+        kind: sample("mesh_viewer_plotter_frames", kind=kind)
+        for kind in ("rebuild", "update")
+    }
+    sphere = pv.Sphere()
+    pool.render(sphere, key="sphere", window_size=(64, 64))
+    pool.render(
+        sphere, key="sphere", properties={"opacity": 0.5}, window_size=(64, 64)
+    )
+    assert sample("mesh_viewer_plotter_frames", kind="rebuild") == (
+        before["rebuild"] + 1
+    )
+    assert sample("mesh_viewer_plotter_frames", kind="update") == before["update"] + 1
+    assert pool.stats()["frames"] == 2
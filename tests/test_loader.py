@@ -0,0 +1,31 @@
+import numpy as np
+
+import loader
+from benchmarks.datasets import write_vtm
+from loader import load_array_stats, load_grid
+from timeseries import compute_slice_stats, stats_percentiles
+
+
+def test_array_stats_match_the_whole_file(tmp_path):
+    path = write_vtm(tmp_path / "case.vtm", "tiny", depth=2, fanout=2)
+    expected = compute_slice_stats(str(path))
+    for name in ("pressure", "temperature", "velocity#1"):
+        stats = load_array_stats(path, name)
+        low, high = expected["ranges"][name]
+        np.testing.assert_allclose(stats["ranges"][name], [low, high])
+        # merged blocks share their boundary points, so only the limits agree
+        percentiles = stats_percentiles(stats)[name]
+        assert low <= percentiles[0] < percentiles[1] <= high
+
+
+def test_array_stats_reuse_the_loaded_grid(tmp_path, monkeypatch):
+    path = write_vtm(tmp_path / "case.vtm", "tiny", depth=1, fanout=2)
+    assert load_array_stats(path, "pressure", cached_only=True) is None
+    _, grid, _ = load_grid(path, scalars="pressure")
+
+    def read_datasets(*args, **kwargs):
+        raise AssertionError("the artifact was read again")
+
+    monkeypatch.setattr(loader, "read_datasets", read_datasets)
+    stats = load_array_stats(path, "pressure", grid=grid)
+    assert load_array_stats(path, "pressure", cached_only=True) == stats
@@ -0,0 +1,72 @@
+import numpy as np
+import pyvista as pv
+
+from consts import RepresentationType
+import representation
+from representation import MeshRepresentation
+
+
+def test_orientation_rotates_x_then_y():
+    representation = MeshRepresentation(None, rotate_x=30, rotate_y=40)
+    actor = pv.Actor()
+    actor.orientation = representation.orientation()
+    matrix = pv.array_from_vtkmatrix(actor.GetMatrix())[:3, :3]
+    points = np.random.default_rng(0).random((10, 3))
+    expected = (
+        pv.PolyData(points).rotate_x(30, inplace=False).rotate_y(40, inplace=False)
+    )
+    np.testing.assert_allclose(points @ matrix.T, expected.points, atol=1e-6)
+
+
+def test_orientation_without_rotation():
+    representation = MeshRepresentation(None)
+    np.testing.assert_allclose(representation.orientation(), [0, 0, 0])
+
+
+def make_volume():
+    grid = pv.ImageData(dimensions=(5, 5, 5))
+    grid.cell_data["temperature"] = np.arange(grid.n_cells, dtype=float)
+    return grid
+
+
+def field_patch(grid, representation_type=RepresentationType.Surface.value):
+    representation = MeshRepresentation(
+        grid,
+        color_array_name="temperature",
+        representation_type=representation_type,
+        track_topology=True,
+    )
+    representation.get_field_patch([0, 1])
+    fingerprint = representation.fingerprint
+    representation = MeshRepresentation(
+        grid,
+        color_array_name="temperature",
+        representation_type=representation_type,
+        track_topology=True,
+    )
+    return representation.get_field_patch([0, 1], fingerprint)
+
+
+def test_field_patch_on_surface():
+    surface = pv.Plane(i_resolution=4, j_resolution=4)
+    surface.cell_data["temperature"] = np.arange(surface.n_cells, dtype=float)
+    assert field_patch(surface) is not None
+
+
+def test_no_field_patch_through_geometry_filter():
+    volume = make_volume()
+    assert field_patch(volume) is None
+    assert field_patch(volume.cast_to_structured_grid()) is None
+    assert (
+        field_patch(
+            volume.cast_to_unstructured_grid(), RepresentationType.Points.value
+        )
+        is None
+    )
+
+
+def test_no_field_patch_with_url_transport(monkeypatch):
+    monkeypatch.setattr(representation, "MESH_TRANSPORT", "url")
+    surface = pv.Plane(i_resolution=4, j_resolution=4)
+    surface.cell_data["temperature"] = np.arange(surface.n_cells, dtype=float)
+    assert field_patch(surface) is None
@@ -0,0 +1,72 @@
+import gc
+
+import numpy as np
+import pytest
+import pyvista as pv
+
+import sidecar
+from benchmarks.datasets import make_grid, write_vtm
+from utils import merge_vtk_datasets
+
+
+def leaves(dataset):
+    if isinstance(dataset, pv.MultiBlock):
+        return [leaf for block in dataset for leaf in leaves(block)]
+    return [dataset]
+
+
+def assert_same_leaf(mapped, parsed):
+    assert type(mapped) is type(parsed)
+    np.testing.assert_array_equal(mapped.points, parsed.points)
+    np.testing.assert_array_equal(mapped.celltypes, parsed.celltypes)
+    np.testing.assert_array_equal(mapped.offset, parsed.offset)
+    np.testing.assert_array_equal(mapped.cell_connectivity, parsed.cell_connectivity)
+    for attribute in ("point_data", "cell_data"):
+        mapped_data = getattr(mapped, attribute)
+        parsed_data = getattr(parsed, attribute)
+        assert sorted(mapped_data.keys()) == sorted(parsed_data.keys())
+        for name in parsed_data.keys():
+            np.testing.assert_array_equal(mapped_data[name], parsed_data[name])
+
+
+@pytest.fixture
+def vtu(tmp_path):
+    path = tmp_path / "case.vtu"
+    make_grid(8).save(path)
+    return path
+
+
+@pytest.fixture
+def vtm(tmp_path):
+    return write_vtm(tmp_path / "case.vtm", "tiny", depth=2, fanout=2)
+
+
+@pytest.mark.parametrize("dataset", ["vtu", "vtm"])
+def test_sidecar_matches_parsed_dataset(dataset, request):
+    path = request.getfixturevalue(dataset)
+    assert sidecar.ingest_file(path)
+    assert sidecar.has_sidecar(path)
+    mapped = sidecar.load_sidecar(path)
+    # the mapped buffers must outlive the wrappers that created them
+    gc.collect()
+    parsed = pv.read(path)
+    assert len(leaves(mapped)) == len(leaves(parsed))
+    for mapped_leaf, parsed_leaf in zip(leaves(mapped), leaves(parsed)):
+        assert_same_leaf(mapped_leaf, parsed_leaf)
+
+
+def test_sidecar_merges_after_collection(vtm):
+    sidecar.ingest_file(vtm)
+    mapped = sidecar.load_sidecar(vtm)
+    gc.collect()
+    _, merged, _ = merge_vtk_datasets(mapped, scalars="temperature")
+    _, expected, _ = merge_vtk_datasets(pv.read(vtm), scalars="temperature")
+    assert merged.n_cells == expected.n_cells
+    np.testing.assert_array_equal(merged.celltypes, expected.celltypes)
+
+
+def test_changed_source_invalidates_sidecar(vtu):
+    sidecar.ingest_file(vtu)
+    make_grid(4).save(vtu)
+    assert not sidecar.has_sidecar(vtu)
+    assert sidecar.load_sidecar(vtu) is None
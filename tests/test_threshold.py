@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+import pyvista as pv
+
+from threshold import threshold_grid, threshold_mask
+
+
+def make_grid(seed=0):
+    grid = pv.ImageData(dimensions=(6, 6, 6)).cast_to_unstructured_grid()
+    rng = np.random.default_rng(seed)
+    grid.point_data["pressure"] = rng.random(grid.n_points)
+    grid.point_data["velocity"] = rng.random((grid.n_points, 3))
+    grid.cell_data["stress"] = rng.random((grid.n_cells, 3))
+    grid.cell_data["cell_id"] = np.arange(grid.n_cells)
+    return grid
+
+
+def cell_ids(grid):
+    # empty results carry no arrays
+    if not grid.n_cells:
+        return np.array([], dtype=int)
+    return np.sort(grid.cell_data["cell_id"])
+
+
+def expected_cells(grid, name, threshold):
+    # the two chained passes the mask replaces
+    result = grid.threshold(threshold[0], scalars=name, method="upper")
+    result = result.threshold(threshold[1], scalars=name, method="lower")
+    return cell_ids(result)
+
+
+def selected_cells(grid, name, threshold):
+    return cell_ids(threshold_grid(grid, name, threshold))
+
+
+@pytest.mark.parametrize("name", ["pressure", "velocity", "stress"])
+@pytest.mark.parametrize("threshold", [(0.2, 0.5), (0.4, 0.6), (0.7, 0.9)])
+def test_same_cells_as_threshold(name, threshold):
+    grid = make_grid()
+    np.testing.assert_array_equal(
+        selected_cells(grid, name, threshold), expected_cells(grid, name, threshold)
+    )
+
+
+@pytest.mark.parametrize("name", ["pressure", "velocity"])
+def test_nan_point_is_ignored(name):
+    grid = make_grid(1)
+    values = grid.point_data[name].copy()
+    values[grid.n_points // 2] = np.nan
+    values[:3] = np.nan
+    grid.point_data[name] = values
+    for threshold in [(0.2, 0.5), (0.6, 0.8)]:
+        np.testing.assert_array_equal(
+            selected_cells(grid, name, threshold),
+            expected_cells(grid, name, threshold),
+        )
+
+
+def test_invert_skips_nan_cells():
+    grid = make_grid()
+    values = grid.cell_data["stress"].copy()
+    values[0, 1] = np.nan
+    grid.cell_data["stress"] = values
+    mask = threshold_mask(grid, "stress", (0.2, 0.5))
+    inverted = threshold_mask(grid, "stress", (0.2, 0.5), invert=True)
+    assert not mask[0] and not inverted[0]
+    np.testing.assert_array_equal(inverted[1:], ~mask[1:])
@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+
+import timeseries
+from benchmarks.datasets import write_series
+from timeseries import TimeSeriesMesh, compute_slice_stats
+
+
+def make_series(tmp_path, steps=10):
+    return TimeSeriesMesh(write_series(tmp_path / "case.series", "tiny", steps))
+
+
+def scan(time_series, chunk_size=3):
+    return list(time_series.update_ranges(chunk_size=chunk_size))
+
+
+def test_scan_appends_each_slice_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(timeseries, "RANGE_WORKERS", 1)
+    time_series = make_series(tmp_path)
+    assert time_series.cached_stats()[1] is False
+
+    progress = []
+    for done, total in time_series.update_ranges(chunk_size=3):
+        stats, complete = time_series.cached_stats()
+        progress.append((done, total, complete))
+    assert progress[-1] == (10, 10, True)
+    assert not any(complete for _, _, complete in progress[:-1])
+    assert len(time_series.range_log_path.read_text().splitlines()) == 10
+
+    stats, complete = time_series.cached_stats()
+    expected = [
+        compute_slice_stats(str(time_series.slice_path(i)))["ranges"]["pressure"]
+        for i in range(time_series.n_slices)
+    ]
+    np.testing.assert_allclose(
+        stats["ranges"]["pressure"],
+        [min(i[0] for i in expected), max(i[1] for i in expected)],
+    )
+    low, high = stats["histograms"]["pressure"]["percentiles"]
+    assert stats["ranges"]["pressure"][0] <= low <= high
+    assert high <= stats["ranges"]["pressure"][1]
+
+
+def test_rewritten_slice_is_rescanned(tmp_path, monkeypatch):
+    monkeypatch.setattr(timeseries, "RANGE_WORKERS", 1)
+    time_series = make_series(tmp_path)
+    scan(time_series)
+    summary_stat = time_series.ranges_path.stat()
+    assert scan(time_series) == []
+    # nothing to do: the summary is left alone
+    assert time_series.ranges_path.stat().st_mtime_ns == summary_stat.st_mtime_ns
+
+    path = time_series.slice_path(4)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    # polls only check the .series index; opening the artifact checks slices
+    assert time_series.cached_stats()[1] is True
+    assert time_series.cached_stats(verify_slices=True)[1] is False
+    assert scan(time_series) == [(1, 1)]
+    assert time_series.cached_stats()[1] is True
+    assert len(time_series.load_range_index()) == 10
+    assert scan(time_series) == []
+    # the stale line is compacted away
+    assert len(time_series.range_log_path.read_text().splitlines()) == 10
+
+
+def test_truncated_log_line_is_ignored(tmp_path, monkeypatch):
+    monkeypatch.setattr(timeseries, "RANGE_WORKERS", 1)
+    time_series = make_series(tmp_path)
+    scan(time_series)
+    lines = time_series.range_log_path.read_text().splitlines()
+    time_series.range_log_path.write_text("\n".join(lines[:-1] + [lines[-1][:20]]))
+    time_series.ranges_path.unlink()
+    assert scan(time_series) == [(1, 1)]
+    assert time_series.cached_stats()[1] is True
+    assert len(time_series.load_range_index()) == 10
+    assert scan(time_series) == []
+
+
+def test_poll_does_not_stat_slices(tmp_path, monkeypatch):
+    monkeypatch.setattr(timeseries, "RANGE_WORKERS", 1)
+    time_series = make_series(tmp_path)
+    scan(time_series)
+
+    def slice_stats():
+        raise AssertionError("every slice was stat'ed")
+
+    monkeypatch.setattr(time_series, "slice_stats", slice_stats)
+    assert time_series.cached_stats()[1] is True
+    # a rewritten index may list other slices
+    stat = time_series.filepath.stat()
+    os.utime(time_series.filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert time_series.cached_stats()[1] is False
+    monkeypatch.undo()
+    assert scan(time_series) == []
+    assert time_series.cached_stats()[1] is True
@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import pyvista as pv
+
+from cache import LRUCache
+from instrumentation import stage
+
+
+THRESHOLD_CACHE_MAX_SIZE = int(
+    os.getenv("THRESHOLD_CACHE_MAX_SIZE", 1024 * 256)
+)  # KiB, 256MB
+
+# per-cell bounds of each thresholded array, so moving the slider only
+# repeats the comparisons
+bounds_cache = LRUCache(
+    THRESHOLD_CACHE_MAX_SIZE,
+    sizeof=lambda value: (value[0].nbytes + value[1].nbytes) // 1024,
+    name="threshold",
+)
+
+
+def _component_bounds(values):
+    # smallest and largest component of each tuple; as with
+    # `component_mode="all"` a NaN component fails the whole tuple
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        return values, values
+    values = values.reshape(len(values), -1)
+    return values.min(axis=1), values.max(axis=1)
+
+
+def _cell_connectivity(grid):
+    if not isinstance(grid, pv.UnstructuredGrid):
+        grid = grid.cast_to_unstructured_grid()
+    return np.asarray(grid.cell_connectivity), np.asarray(grid.offset)
+
+
+def cell_bounds(grid, name):
+    # `(reach, floor)` per cell: a cell passes the lower bound if `reach` does
+    # and the upper bound if `floor` does. Cell data is preferred over point
+    # data, as in `DataSet.threshold`.
+    if name in grid.cell_data:
+        return _component_bounds(grid.cell_data[name])
+    low, high = _component_bounds(grid.point_data[name])
+    connectivity, offsets = _cell_connectivity(grid)
+    n_cells = len(offsets) - 1
+    if not len(connectivity):
+        empty = np.full(n_cells, np.nan)
+        return empty, empty
+    starts = np.minimum(offsets[:-1], len(connectivity) - 1)
+    # any point of the cell may pass each bound; NaN points never do
+    reach = np.fmax.reduceat(low[connectivity], starts)
+    floor = np.fmin.reduceat(high[connectivity], starts)
+    empty = offsets[1:] == offsets[:-1]
+    reach[empty] = np.nan
+    floor[empty] = np.nan
+    return reach, floor
+
+
+def threshold_mask(grid, name, threshold, invert=False, key=None):
+    bounds = bounds_cache.get((key, name)) if key is not None else None
+    if bounds is None:
+        bounds = cell_bounds(grid, name)
+        if key is not None:
+            bounds_cache.put((key, name), bounds)
+    reach, floor = bounds
+    lower, upper = threshold
+    # same selection as an "upper" then a "lower" `threshold` pass: some tuple
+    # of the cell reaches `lower` and some tuple does not exceed `upper`
+    with np.errstate(invalid="ignore"):
+        mask = (reach >= lower) & (floor <= upper)
+        if invert:
+            mask = ~mask & ~(np.isnan(reach) & np.isnan(floor))
+    return mask
+
+
+def threshold_grid(grid, name, threshold, invert=False, key=None):
+    with stage("threshold") as record:
+        mask = threshold_mask(grid, name, threshold, invert=invert, key=key)
+        if not mask.all():
+            grid = grid.extract_cells(np.flatnonzero(mask))
+        record.add_grid(grid)
+    return grid
@@ -1,11 +1,182 @@
 import json
-import sys
+import os
+import hashlib
+import warnings
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 from functools import cached_property
 
-import pyvista as pv
+import numpy as np
 
-from utils import merge_vtk_datasets
+from cache import LRUCache
+from common import available_cpus, union_range
+from instrumentation import stage
+
+
+RANGE_INDEX_VERSION = 3
+# Each worker imports VTK and holds a slice: the pod's CPU limit bounds it, and
+# a small cap keeps it within the pod's memory on large nodes
+RANGE_WORKERS_MAX = int(os.getenv("RANGE_WORKERS_MAX", 4))
+RANGE_WORKERS = int(
+    os.getenv("RANGE_WORKERS", min(available_cpus(), RANGE_WORKERS_MAX))
+)
+RANGE_CHUNK_SIZE = int(os.getenv("RANGE_CHUNK_SIZE", 64))
+SERIES_INDEX_CACHE_SIZE = int(os.getenv("SERIES_INDEX_CACHE_SIZE", 256))  # entries
+HISTOGRAM_BINS = int(os.getenv("HISTOGRAM_BINS", 64))
+PERCENTILES = (1, 99)
+
+# parsed `.series` indexes shared by every `TimeSeriesMesh` of the process
+series_index_cache = LRUCache(SERIES_INDEX_CACHE_SIZE)
+# parsed range summaries, keyed by the summary file's mtime and size
+summary_cache = LRUCache(16)
+
+
+def load_series_info(filepath):
+    # a rewritten index has a new mtime or size and is parsed again
+    stat = os.stat(filepath)
+    key = (os.path.realpath(filepath), stat.st_mtime_ns, stat.st_size)
+    info = series_index_cache.get(key)
+    if info is None:
+        with open(filepath) as f:
+            info = json.load(f)
+        series_index_cache.put(key, info)
+    return info
+
+
+def merge_ranges(ranges, other):
+    for name, data_range in other.items():
+        ranges[name] = union_range(ranges.get(name), data_range)
+    return ranges
+
+
+def histogram_percentiles(counts, data_range, percentiles=PERCENTILES):
+    counts = np.asarray(counts, dtype=np.float64)
+    total = counts.sum()
+    if not total or data_range[1] <= data_range[0]:
+        return [data_range[0]] * len(percentiles)
+    edges = np.linspace(data_range[0], data_range[1], len(counts) + 1)
+    cumulative = np.concatenate([[0.0], np.cumsum(counts)]) / total
+    # linear within a bin, which is as much as the histogram knows
+    return np.interp(np.asarray(percentiles) / 100, cumulative, edges).tolist()
+
+
+def combine_histograms(histograms):
+    # Rebin any number of histograms of one array onto their common range in a
+    # single pass, spreading the counts of each bin at its centre
+    if len(histograms) == 1:
+        return histograms[0]
+    lows, highs = np.array([i["range"] for i in histograms], dtype=np.float64).T
+    counts = np.array([i["counts"] for i in histograms], dtype=np.float64)
+    data_range = [float(lows.min()), float(highs.max())]
+    if data_range[1] > data_range[0]:
+        n_bins = counts.shape[1]
+        centers = lows[:, None] + (np.arange(n_bins) + 0.5) * (
+            (highs - lows) / n_bins
+        )[:, None]
+        combined, _ = np.histogram(
+            centers.ravel(),
+            bins=HISTOGRAM_BINS,
+            range=tuple(data_range),
+            weights=counts.ravel(),
+        )
+    else:
+        combined = np.zeros(HISTOGRAM_BINS)
+        combined[0] = counts.sum()
+    # a percentile of the union lies between the percentiles of its parts,
+    # which keeps the estimate sane when outliers squash the bins
+    bounds = np.array([i["percentiles"] for i in histograms])
+    percentiles = np.clip(
+        histogram_percentiles(combined, data_range), bounds.min(0), bounds.max(0)
+    )
+    return {
+        "range": data_range,
+        "counts": combined.tolist(),
+        "percentiles": percentiles.tolist(),
+    }
+
+
+def combine_stats(stats_list):
+    ranges = {}
+    histograms = {}
+    for stats in stats_list:
+        merge_ranges(ranges, stats["ranges"])
+        for name, histogram in stats["histograms"].items():
+            histograms.setdefault(name, []).append(histogram)
+    return {
+        "ranges": ranges,
+        "histograms": {
+            name: combine_histograms(group) for name, group in histograms.items()
+        },
+    }
+
+
+def array_stats(name, data):
+    # Ranges, fixed-bin histograms and percentiles of every component, one
+    # `bincount` for all components
+    data = np.asarray(data)
+    if data.size == 0 or not np.issubdtype(data.dtype, np.number):
+        return {"ranges": {}, "histograms": {}}
+    columns = data.reshape(len(data), -1).astype(np.float64, copy=False)
+    with warnings.catch_warnings():
+        # all-NaN components are skipped below
+        warnings.simplefilter("ignore", RuntimeWarning)
+        min_vals = np.nanmin(columns, axis=0)
+        max_vals = np.nanmax(columns, axis=0)
+        percentiles = np.nanpercentile(columns, PERCENTILES, axis=0)
+    valid = ~np.isnan(columns)
+    widths = np.where(max_vals > min_vals, max_vals - min_vals, 1.0)
+    with np.errstate(invalid="ignore"):
+        bins = np.floor((columns - min_vals) / widths * HISTOGRAM_BINS)
+    bins = np.clip(np.nan_to_num(bins), 0, HISTOGRAM_BINS - 1).astype(np.int64)
+    bins += np.arange(columns.shape[1]) * HISTOGRAM_BINS
+    counts = np.bincount(
+        bins[valid], minlength=columns.shape[1] * HISTOGRAM_BINS
+    ).reshape(columns.shape[1], HISTOGRAM_BINS)
+
+    ranges = {}
+    histograms = {}
+    for i in range(columns.shape[1]):
+        if np.isnan(min_vals[i]):
+            continue
+        key = f"{name}#{i}" if data.ndim > 1 else name
+        ranges[key] = [float(min_vals[i]), float(max_vals[i])]
+        histograms[key] = {
+            "range": ranges[key],
+            "counts": counts[i].tolist(),
+            "percentiles": [float(p) for p in percentiles[:, i]],
+        }
+    if data.ndim > 1 and ranges:
+        # the array as a whole spans all of its components
+        histograms[name] = combine_histograms(list(histograms.values()))
+        ranges[name] = histograms[name]["range"]
+    return {"ranges": ranges, "histograms": histograms}
+
+
+def compute_slice_stats(slice_file):
+    # VTK is imported only where slices are read, so the web role can use the
+    # series index without it
+    from sidecar import read_dataset
+    from utils import iter_blocks
+
+    return combine_stats(
+        array_stats(name, data[name])
+        for block in iter_blocks(read_dataset(slice_file))
+        for data in (block.point_data, block.cell_data)
+        for name in data.keys()
+    )
+
+
+def sources_digest(stats):
+    return hashlib.sha1(json.dumps(stats, sort_keys=True).encode()).hexdigest()
+
+
+def stats_percentiles(stats):
+    return {
+        name: histogram["percentiles"]
+        for name, histogram in stats["histograms"].items()
+    }
 
 
 class TimeSeriesMesh:
@@ -13,53 +184,247 @@ class TimeSeriesMesh:
     def __init__(self, filepath):
         self.filepath = Path(filepath)
         self.root = self.filepath.parent
-        self.filename = filepath.name
+        self.filename = self.filepath.name
 
     @cached_property
     def info(self):
-        with self.filepath.open() as f:
-            return json.load(f)
+        return load_series_info(self.filepath)
 
     @property
     def n_slices(self):
         return len(self.info["files"])
 
-    def read_blocks(self, slice: int = 0):
+    def slice_path(self, slice: int = 0):
         info = self.info
         if len(info["files"]) <= slice:
             raise ValueError(f"Slice {slice} does not exist")
 
         filename = info["files"][slice]["name"]
-        slice_file = self.root / filename
-        return pv.read(slice_file)
+        return self.root / filename
+
+    def slice_time(self, slice: int = 0):
+        return self.info["files"][slice].get("time")
+
+    def time_targets(self, max_targets):
+        # evenly spaced labels, always including the first and last slice
+        n_slices = self.n_slices
+        if n_slices <= max_targets:
+            slices = range(n_slices)
+        else:
+            step = (n_slices - 1) / (max(max_targets, 2) - 1)
+            slices = sorted({round(i * step) for i in range(max(max_targets, 2))})
+        return {i: str(self.slice_time(i)) for i in slices}
+
+    def read_blocks(self, slice: int = 0):
+        from sidecar import read_dataset
+
+        return read_dataset(self.slice_path(slice))
+
+    @property
+    def ranges_path(self):
+        # the combined stats of the series, small and rewritten as a scan runs
+        return self.root / f".{self.filename}.ranges.json"
+
+    @property
+    def range_log_path(self):
+        # per-slice stats, one JSON line per scanned slice; later lines win
+        return self.root / f".{self.filename}.ranges.log"
+
+    def load_range_index(self):
+        index = {}
+        try:
+            with self.range_log_path.open() as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # cut short by an interrupted scan
+                        continue
+                    if entry.pop("version", None) == RANGE_INDEX_VERSION:
+                        index[entry.pop("name")] = entry
+        except OSError:
+            pass
+        return index
+
+    @staticmethod
+    def range_log_lines(entries):
+        return "".join(
+            json.dumps({"version": RANGE_INDEX_VERSION, "name": name, **entry}) + "\n"
+            for name, entry in entries.items()
+        )
+
+    def append_range_index(self, entries):
+        data = self.range_log_lines(entries).encode()
+        try:
+            with self.range_log_path.open("a+b") as f:
+                if f.seek(0, os.SEEK_END):
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        # after a line cut short by an interrupted scan
+                        data = b"\n" + data
+                f.write(data)
+        except OSError:
+            pass
+
+    def save_range_index(self, index):
+        # compaction: drops the lines of slices rewritten since their scan
+        path = self.range_log_path
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}")
+        try:
+            with tmp_path.open("w") as f:
+                f.write(self.range_log_lines(index))
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def load_summary(self):
+        try:
+            stat = self.ranges_path.stat()
+        except OSError:
+            return None
+        key = (str(self.ranges_path), stat.st_mtime_ns, stat.st_size)
+        summary = summary_cache.get(key)
+        if summary is None:
+            try:
+                with self.ranges_path.open() as f:
+                    summary = json.load(f)
+            except (OSError, ValueError):
+                return None
+            if summary.get("version") != RANGE_INDEX_VERSION:
+                return None
+            summary_cache.put(key, summary)
+        return summary
+
+    def save_summary(self, stats, scanned, sources):
+        path = self.ranges_path
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}")
+        summary = {
+            "version": RANGE_INDEX_VERSION,
+            "sources": sources,
+            "scanned": scanned,
+            "total": self.n_slices,
+            "series": self.series_stat(),
+            "stats": stats,
+        }
+        try:
+            with tmp_path.open("w") as f:
+                json.dump(summary, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def series_stat(self):
+        try:
+            stat = self.filepath.stat()
+        except OSError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def slice_stats(self):
+        stats = {}
+        for item in self.info["files"]:
+            stat = (self.root / item["name"]).stat()
+            stats[item["name"]] = [stat.st_mtime_ns, stat.st_size]
+        return stats
+
+    def valid_slices(self, index, stats):
+        return {
+            name: index[name]
+            for name, stat in stats.items()
+            if name in index and index[name]["stat"] == stat
+        }
+
+    def cached_stats(self, verify_slices=False):
+        # Polled while a scan runs and read on every render: only the summary
+        # and the .series index are stat'ed. Slices rewritten in place are
+        # only noticed with `verify_slices`, as when the artifact is opened
+        summary = self.load_summary()
+        if summary is None:
+            return combine_stats([]), False
+        complete = (
+            summary["scanned"] == summary["total"]
+            and summary.get("series") == self.series_stat()
+        )
+        if complete and verify_slices:
+            complete = summary["sources"] == sources_digest(self.slice_stats())
+        return summary["stats"], complete
+
+    def cached_ranges(self):
+        stats, complete = self.cached_stats()
+        return stats["ranges"], complete
+
+    def update_ranges(self, chunk_size=RANGE_CHUNK_SIZE):
+        index = self.load_range_index()
+        stats = self.slice_stats()
+        sources = sources_digest(stats)
+        valid = self.valid_slices(index, stats)
+        if len(index) > len(valid):
+            self.save_range_index(valid)
+        stale = [name for name in stats if name not in valid]
+        summary = self.load_summary()
+        if (
+            not stale
+            and summary is not None
+            and summary["sources"] == sources
+            and summary["scanned"] == len(valid)
+            and summary.get("series") == self.series_stat()
+        ):
+            return
+        combined = combine_stats([valid[name] for name in stats if name in valid])
+        # pollers see the scan as incomplete before its first chunk is done
+        self.save_summary(combined, len(valid), sources)
+        if not stale:
+            return
+        workers = min(RANGE_WORKERS, len(stale))
+        with self.range_executor(workers) as executor:
+            for start in range(0, len(stale), chunk_size):
+                chunk = stale[start : start + chunk_size]
+                with stage("range_scan", slices=len(chunk)):
+                    computed = self.compute_ranges(chunk, executor)
+                entries = {
+                    name: {"stat": stats[name], **result}
+                    for name, result in computed.items()
+                }
+                self.append_range_index(entries)
+                valid.update(entries)
+                if len(valid) == len(stats):
+                    # one rebin of every slice, rather than the running estimate
+                    combined = combine_stats([valid[name] for name in stats])
+                else:
+                    combined = combine_stats([combined, *computed.values()])
+                self.save_summary(combined, len(valid), sources)
+                yield start + len(chunk), len(stale)
+
+    def get_stats(self):
+        for _ in self.update_ranges():
+            pass
+        return self.cached_stats()[0]
 
     def get_ranges(self):
-        range_cache_filepath = self.root / ".ranges.json"
-        if range_cache_filepath.exists():
-            with range_cache_filepath.open() as f:
-                cached = json.load(f)
-            if cached["n_slices"] == self.n_slices:
-                return cached["ranges"]
-        ranges = self.compute_ranges()
-        self.save_ranges(ranges)
-        return ranges
-
-    def save_ranges(self, ranges):
-        range_cache_filepath = self.root / ".ranges.json"
-        with range_cache_filepath.open("w") as f:
-            json.dump({"n_slices": self.n_slices, "ranges": ranges}, f, indent=2)
-
-    def compute_ranges(self):
-        ranges = {}
-        for i in range(self.n_slices):
-            blocks = self.read_blocks(i)
-            array_names, grid, _ = merge_vtk_datasets(blocks)
-            for name in array_names:
-                min_val, max_val = ranges.get(name) or [
-                    sys.float_info.max,
-                    -sys.float_info.max,
-                ]
-                min_val = float(min(min_val, grid[name].min()))
-                max_val = float(max(max_val, grid[name].max()))
-                ranges[name] = [min_val, max_val]
-        return ranges
+        return self.get_stats()["ranges"]
+
+    @staticmethod
+    @contextmanager
+    def range_executor(workers):
+        if workers <= 1:
+            yield None
+            return
+        # spawn rather than fork: workers run next to VTK/X11 state and threads
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            yield executor
+
+    def compute_ranges(self, slice_names=None, executor=None):
+        if slice_names is None:
+            slice_names = [item["name"] for item in self.info["files"]]
+        slice_files = [str(self.root / name) for name in slice_names]
+        if executor is None:
+            results = map(compute_slice_stats, slice_files)
+        else:
+            results = executor.map(
+                compute_slice_stats,
+                slice_files,
+                chunksize=max(1, len(slice_files) // (RANGE_WORKERS * 4)),
+            )
+        return dict(zip(slice_names, results))
@@ -0,0 +1,149 @@
+import os
+import base64
+import hashlib
+
+import numpy as np
+import pyvista as pv
+from dash_vtk.utils import to_mesh_state
+from vtkmodules.vtkIOXML import vtkXMLPolyDataWriter
+
+from instrumentation import stage
+
+
+MESH_TRANSPORT = os.getenv("MESH_TRANSPORT", "binary")  # binary | json | url
+MESH_FLOAT32 = os.getenv("MESH_FLOAT32", "true") == "true"
+
+MESH_ARRAY_KEYS = ("points", "verts", "lines", "polys", "strips")
+JS_TYPES = {
+    "int8": "Int8Array",
+    "uint8": "Uint8Array",
+    "int16": "Int16Array",
+    "uint16": "Uint16Array",
+    "int32": "Int32Array",
+    "uint32": "Uint32Array",
+    "float32": "Float32Array",
+    "float64": "Float64Array",
+}
+
+
+def decode_array(encoded):
+    array = np.frombuffer(base64.b64decode(encoded["bvals"]), dtype=encoded["dtype"])
+    return array.reshape(encoded["shape"])
+
+
+def encode_array(values, float32=MESH_FLOAT32):
+    # `{"bvals", "dtype", "shape"}` is decoded straight into a typed array by
+    # the dash-vtk client, instead of going through a JSON number list.
+    if isinstance(values, dict) and "bvals" in values:
+        array = decode_array(values)
+    else:
+        array = np.asarray(values)
+    if float32 and array.dtype == np.float64:
+        array = array.astype(np.float32)
+    elif array.dtype == np.int64 and (
+        array.size == 0 or (array.min() >= -(2**31) and array.max() < 2**31)
+    ):
+        array = array.astype(np.int32)
+    return {
+        "bvals": base64.b64encode(np.ascontiguousarray(array).tobytes()).decode(),
+        "dtype": str(array.dtype),
+        "shape": list(array.shape),
+    }
+
+
+def encode_mesh_state(state, float32=MESH_FLOAT32):
+    mesh = state.get("mesh") or {}
+    for key in MESH_ARRAY_KEYS:
+        if mesh.get(key) is not None:
+            mesh[key] = encode_array(mesh[key], float32=float32)
+    field = state.get("field")
+    if field and field.get("values") is not None:
+        field["values"] = encode_array(field["values"], float32=float32)
+        field["type"] = JS_TYPES.get(field["values"]["dtype"], field.get("type"))
+    return state
+
+
+def build_field_state(grid, name, transport=MESH_TRANSPORT):
+    # Same layout as the `field` entry of `to_mesh_state`, without the geometry
+    if name in grid.point_data:
+        location = "PointData"
+        values = np.asarray(grid.point_data[name])
+    elif name in grid.cell_data:
+        location = "CellData"
+        values = np.asarray(grid.cell_data[name])
+    else:
+        return None
+    magnitude = np.linalg.norm(values, axis=1) if values.ndim > 1 else values
+    field = {
+        "name": name,
+        "type": JS_TYPES.get(str(values.dtype), "Float64Array"),
+        "values": values,
+        "dataRange": [float(np.nanmin(magnitude)), float(np.nanmax(magnitude))],
+        "location": location,
+        "numberOfComponents": values.shape[1] if values.ndim > 1 else 1,
+    }
+    if transport == "binary":
+        field["values"] = encode_array(values)
+        field["type"] = JS_TYPES.get(field["values"]["dtype"], field["type"])
+    return field
+
+
+def mesh_fingerprint(grid):
+    # Identifies points and connectivity, so frames that only differ in their
+    # field values can be swapped in without resending the geometry.
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(type(grid).__name__.encode())
+    digest.update(np.ascontiguousarray(grid.points).tobytes())
+    if hasattr(grid, "faces"):
+        arrays = (grid.verts, grid.lines, grid.faces, grid.strips)
+    elif hasattr(grid, "celltypes"):
+        arrays = (grid.cells, grid.celltypes)
+    else:
+        arrays = (np.asarray(grid.dimensions),)
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def payload_size(state):
+    size = 0
+    for key in MESH_ARRAY_KEYS:
+        value = (state.get("mesh") or {}).get(key)
+        if isinstance(value, dict):
+            size += len(value["bvals"])
+    field = state.get("field") or {}
+    if isinstance(field.get("values"), dict):
+        size += len(field["values"]["bvals"])
+    return size
+
+
+def build_mesh_state(grid, color_array_name=None, transport=MESH_TRANSPORT):
+    with stage("mesh_state", transport=transport) as record:
+        state = to_mesh_state(grid, color_array_name)
+        if transport == "binary":
+            state = encode_mesh_state(state)
+            record["payload_bytes"] = payload_size(state)
+        record.add_grid(grid)
+    return state
+
+
+def polydata_bytes(grid, color_array_name=None):
+    # vtk.js only ships an XML PolyData reader
+    if not isinstance(grid, pv.PolyData):
+        grid = grid.extract_geometry()
+    else:
+        grid = grid.copy(deep=False)
+    if color_array_name and color_array_name in grid.array_names:
+        grid.set_active_scalars(color_array_name)
+    writer = vtkXMLPolyDataWriter()
+    writer.SetInputData(grid)
+    # inline base64 keeps the document text-safe for WriteToOutputString
+    writer.SetDataModeToBinary()
+    writer.SetCompressorTypeToZLib()
+    writer.WriteToOutputStringOn()
+    with stage("vtp") as record:
+        writer.Write()
+        data = writer.GetOutputString().encode()
+        record["payload_bytes"] = len(data)
+        record.add_grid(grid)
+    return data
@@ -1,29 +1,7 @@
-import os
-from pathlib import Path
-from typing import Union
-
+import numpy as np
 import pyvista as pv
 
 
-def must_safe_join(
-    base_dir: Union[str, Path], sub_path: Union[str, Path], *, allow_subpath_empty=False
-) -> Path:
-    base_dir = str(base_dir)
-    sub_path = str(sub_path)
-
-    base_dir = os.path.abspath(base_dir)
-    sub_path = os.path.normpath(sub_path)
-
-    final_path = os.path.abspath(os.path.join(base_dir, sub_path))
-    common_prefix = os.path.commonprefix([base_dir, final_path])
-    if final_path == base_dir and not allow_subpath_empty:
-        raise Exception("Malicious path detected")
-    elif common_prefix == base_dir:
-        return Path(final_path)
-    else:
-        raise Exception("Malicious path detected")
-
-
 def get_scalar_names(grid):
     if isinstance(grid, pv.MultiBlock):
         names = []
@@ -33,33 +11,64 @@ def get_scalar_names(grid):
     return list(sorted(set(grid.point_data.keys() + grid.cell_data.keys())))
 
 
+def iter_blocks(datasets):
+    if isinstance(datasets, pv.MultiBlock):
+        for block in datasets:
+            if block is not None:
+                yield from iter_blocks(block)
+    else:
+        yield datasets
+
+
+def component_names(grid):
+    array_names = []
+    for name in get_scalar_names(grid):
+        data_array = grid.get_array(name)
+        ndim = data_array.shape[1] if data_array.ndim > 1 else 1
+        if ndim == 1:
+            array_names.append(name)
+        else:
+            array_names.extend(f"{name}#{i}" for i in range(ndim))
+    return array_names
+
+
+def split_component(grid, name):
+    # Materialize a single `name#i` component array, leaving the source intact
+    if grid is None or not name or "#" not in name or name in grid.array_names:
+        return grid
+    base, i = name.rsplit("#", 1)
+    for data in (grid.point_data, grid.cell_data):
+        if base in data:
+            data.set_array(np.ascontiguousarray(data[base][:, int(i)]), name)
+            break
+    return grid
+
+
 def merge_vtk_datasets(datasets, scalars=None):
     if scalars is None:
+        requested = []
         scalars = get_scalar_names(datasets)
-    elif not isinstance(scalars, list):
-        scalars = [scalars]
+    else:
+        if not isinstance(scalars, list):
+            scalars = [scalars]
+        requested = scalars
     scalars = [i.split("#")[0] for i in scalars]
 
     array_names = []
-    grid, has_missing = _merge_vtk_datasets(datasets, scalars=scalars)
-    if grid:
+    blocks, has_missing = _collect_vtk_datasets(datasets, scalars=scalars)
+    if not blocks:
+        grid = None
+    elif len(blocks) == 1:
+        grid = blocks[0]
+    else:
+        # a single append pass over every leaf instead of one per nesting level
+        grid = pv.merge(blocks, main_has_priority=False)
+
+    if grid is not None:
         if isinstance(grid, pv.PolyData):
-            for name in get_scalar_names(grid):
-                data_array = grid.get_array(name)
-                ndim = data_array.shape[1] if data_array.ndim > 1 else 1
-                if ndim == 1:
-                    array_names.append(name)
-                    continue
-                for i in range(ndim):
-                    array_names.append(f"{name}#{i}")
-                    if name in grid.point_data:
-                        grid.point_data.set_array(data_array[:, i], f"{name}#{i}")
-                    elif name in grid.cell_data:
-                        grid.cell_data.set_array(data_array[:, i], f"{name}#{i}")
-                if name in grid.point_data:
-                    grid.point_data.remove(name)
-                elif name in grid.cell_data:
-                    grid.cell_data.remove(name)
+            array_names = component_names(grid)
+            for name in requested:
+                split_component(grid, name)
         else:
             array_names = get_scalar_names(grid)
     return (
@@ -69,20 +78,25 @@ def merge_vtk_datasets(datasets, scalars=None):
     )
 
 
-def _merge_vtk_datasets(datasets, scalars):
+def _collect_vtk_datasets(datasets, scalars):
     if isinstance(datasets, pv.MultiBlock):
         has_missing = False
-        blocks = []
+        children = []
         for name in datasets.keys():
-            block, _has_missing = _merge_vtk_datasets(datasets[name], scalars=scalars)
+            leaves, _has_missing = _collect_vtk_datasets(
+                datasets[name], scalars=scalars
+            )
             has_missing = has_missing or _has_missing
-            if block:
-                blocks.append(block)
-        if not blocks:
-            return None, has_missing
-        return pv.merge(blocks), has_missing
+            if leaves:
+                children.append(leaves)
+        # nested `pv.merge` calls append the main (first) dataset last; keep that
+        # order so points and cells come out exactly as they used to
+        children = children[1:] + children[:1]
+        return [leaf for leaves in children for leaf in leaves], has_missing
+    elif datasets is None:
+        return [], False
     elif len(scalars) == 0:
-        return datasets, False
+        return [datasets], False
     elif set(scalars) <= set(datasets.array_names):
-        return datasets, False
-    return None, True
+        return [datasets], False
+    return [], True